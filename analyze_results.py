@@ -4,6 +4,7 @@
 详细分析模型训练结果并提供深入见解
 """
 
+import argparse
 import sys
 import os
 import pandas as pd
@@ -14,6 +15,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.data_loader import DataLoader
 from src.data_preprocessor import DataPreprocessor
+from src.feature_store import FeatureStore
+from src.model_cache import ModelCache
+from src.model_registry import add_registry_arguments, registry_from_args
 from src.model_trainer import ModelTrainer
 from src.visualizer import Visualizer
 
@@ -78,10 +82,11 @@ def analyze_feature_importance(trainer, preprocessor):
         print("模型尚未训练")
         return
     
-    feature_importance = trainer.get_feature_importance()
+    feature_importance, importance_source = trainer.get_feature_importance()
     importance_df = preprocessor.get_feature_importance_data(feature_importance)
     
     print(f"\n最佳模型: {trainer.best_model_name}")
+    print(f"重要性来源: {importance_source}")
     print("\n特征重要性排序 (从高到低):")
     print("-" * 70)
     
@@ -205,11 +210,11 @@ def generate_recommendations(results, trainer):
     
     # 特征工程建议
     if trainer.best_model is not None:
-        feature_importance = trainer.get_feature_importance()
+        feature_importance, _ = trainer.get_feature_importance()
         if len(feature_importance) > 0:
             max_importance = feature_importance.max()
             min_importance = feature_importance.min()
-            if max_importance / min_importance > 100:
+            if max_importance > 100 * min_importance:
                 recommendations.append("💡 特征重要性差异较大，建议:")
                 recommendations.append("   - 考虑移除重要性极低的特征")
                 recommendations.append("   - 对重要特征进行更精细的特征工程")
@@ -221,28 +226,67 @@ def generate_recommendations(results, trainer):
         print("模型表现良好，暂无特殊建议。")
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="共享单车租赁预测 - 结果分析")
+    add_registry_arguments(parser)
+    parser.add_argument('--parallel', action='store_true', help="在进程池中并发训练各候选模型")
+    parser.add_argument('--no-cache', action='store_true', help="不读取也不写入模型缓存，总是重新训练")
+    parser.add_argument('--cv-splits', type=int, default=0,
+                        help="按时间顺序交叉验证的折数（0表示不做交叉验证）")
+    parser.add_argument('--cv-window', choices=['expanding', 'rolling'], default='expanding',
+                        help="交叉验证训练窗口：扩展窗口或固定长度滑动窗口")
+    parser.add_argument('--search', default=None, metavar='MODEL',
+                        help="训练前先用连续减半搜索该模型的超参数")
+    parser.add_argument('--search-budget', type=float, default=None,
+                        help="超参数搜索的墙钟时间预算（秒）")
+    parser.add_argument('--hyperband', action='store_true', help="超参数搜索使用Hyperband")
+    return parser.parse_args()
+
+
 def main():
     """主分析函数"""
+    args = parse_args()
+    
     print("="*70)
     print("共享单车租赁预测 - 结果分析报告")
     print("="*70)
     
-    # 1. 加载数据
-    print("\n[步骤 1] 加载数据...")
-    data_loader = DataLoader(data_dir="data")
-    # df = data_loader.load_day_data()
-    df = data_loader.load_hour_data()
-    
-    # 2. 数据预处理
-    print("\n[步骤 2] 数据预处理...")
+    source_path = os.path.join("data", "hour.csv")
+    preprocess_config = {'target': 'cnt', 'lag_features': None}  # 与 main.py 不使用滞后特征时的配置一致
+    feature_store = FeatureStore(store_dir=os.path.join("output", "feature_store"))
     preprocessor = DataPreprocessor()
-    X, y = preprocessor.prepare_features(df, target="cnt")
-    X_scaled, _ = preprocessor.scale_features(X)
     
-    # 3. 模型训练
+    if feature_store.is_fresh(source_path, preprocess_config):
+        # main.py 已生成最新的特征库，直接零拷贝打开
+        print("\n[步骤 1-2] 从特征库加载特征矩阵...")
+        _, _, preprocessor.feature_columns = feature_store.load()
+    else:
+        # 1. 加载数据
+        print("\n[步骤 1] 加载数据...")
+        data_loader = DataLoader(data_dir="data")
+        # df = data_loader.load_day_data()
+        df = data_loader.load_hour_data()
+        
+        # 2. 数据预处理
+        print("\n[步骤 2] 数据预处理...")
+        X, y = preprocessor.prepare_features(df, target="cnt")
+        feature_store.save(X, y, preprocessor.feature_columns, source_path=source_path,
+                           config=preprocess_config)
+        del df, X, y
+    
+    # 3. 模型训练（可选：先搜索超参数，中断后重新运行会从试验日志恢复）
     print("\n[步骤 3] 模型训练...")
-    trainer = ModelTrainer(random_state=42)
-    results = trainer.train_models(X_scaled, y, test_size=0.2)
+    model_cache = None if args.no_cache else ModelCache(os.path.join("output", "model_cache"))
+    trainer = ModelTrainer(random_state=42, preprocessor=preprocessor,
+                           registry=registry_from_args(args), cache=model_cache)
+    if args.search:
+        X, y, _ = feature_store.load()
+        trainer.search_hyperparameters(X, y, model_name=args.search, time_budget=args.search_budget,
+                                       hyperband=args.hyperband)
+    results = trainer.train_from_store(feature_store, test_size=0.2,
+                                       model_names=args.models, max_cost=args.max_cost,
+                                       parallel=args.parallel)
     
     # 4. 详细分析
     analyze_model_performance(results)
@@ -251,6 +295,12 @@ def main():
     compare_models(results)
     generate_recommendations(results, trainer)
     
+    # 5. 时间序列交叉验证（特征库保持 hour.csv 的时间顺序）
+    if args.cv_splits > 1:
+        X, y, _ = feature_store.load()
+        trainer.cross_validate_time_series(X, y, n_splits=args.cv_splits, window=args.cv_window,
+                                           model_names=args.models, max_cost=args.max_cost)
+    
     print("\n" + "="*70)
     print("分析完成！")
     print("="*70)
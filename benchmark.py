@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+性能基准脚本
+对数据加载、预处理、训练与推理各环节的优化进行计时和内存对比
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.compact_forest import CompactForest
+from src.data_loader import DataLoader
+from src.data_preprocessor import DataPreprocessor, NON_FEATURE_COLUMNS
+from src.model_registry import ModelRegistry
+from src.prediction_table import PredictionLookupTable
+from src.quantile_forest import QuantileForest
+
+
+def make_scaled_csv(source_path: str, factor: int, out_dir: str) -> str:
+    """
+    将CSV数据复制放大指定倍数，写入临时目录
+
+    Args:
+        source_path: 源CSV文件路径
+        factor: 放大倍数
+        out_dir: 输出目录
+
+    Returns:
+        放大后的CSV文件路径
+    """
+    df = pd.read_csv(source_path)
+    scaled = pd.concat([df] * factor, ignore_index=True)
+    scaled['instant'] = np.arange(1, len(scaled) + 1)
+    out_path = os.path.join(out_dir, os.path.basename(source_path))
+    scaled.to_csv(out_path, index=False)
+    print(f"已生成放大 {factor}x 的数据: {out_path} ({len(scaled)} 条记录)")
+    return out_path
+
+
+def timed(func, *args, repeat: int = 3, **kwargs):
+    """
+    多次运行函数并返回最短耗时和最后一次的结果
+
+    Returns:
+        (最短耗时秒数, 函数返回值)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def replicate_rows(df: pd.DataFrame, n_rows: int) -> pd.DataFrame:
+    """
+    按列平铺复制DataFrame到指定行数（保持各列的紧凑类型）
+
+    Args:
+        df: 原始数据
+        n_rows: 目标行数
+
+    Returns:
+        复制后的DataFrame
+    """
+    reps = -(-n_rows // len(df))
+    data = {col: np.tile(df[col].to_numpy(), reps)[:n_rows] for col in df.columns}
+    return pd.DataFrame(data, copy=False)
+
+
+def peak_memory(func, *args, **kwargs):
+    """
+    测量函数执行期间新增内存分配的峰值（NumPy缓冲区会被tracemalloc跟踪）
+
+    Returns:
+        (峰值MB, 耗时秒数, 函数返回值)
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 ** 2, elapsed, result
+
+
+def bench_cache(args):
+    """列式缓存 vs pd.read_csv"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        make_scaled_csv(os.path.join(args.data_dir, "hour.csv"), args.scale, tmp_dir)
+        loader = DataLoader(data_dir=tmp_dir)
+        csv_path = os.path.join(tmp_dir, "hour.csv")
+
+        plain_time, _ = timed(pd.read_csv, csv_path, repeat=args.repeat)
+        loader.cache.clear()
+        cold_time, _ = timed(loader.load_hour_data, repeat=1)
+        warm_time, df = timed(loader.load_hour_data, repeat=args.repeat)
+
+    print("\n列式缓存基准:")
+    print(f"  pd.read_csv (默认类型): {plain_time:.3f} s")
+    print(f"  首次加载 (解析+写缓存): {cold_time:.3f} s")
+    print(f"  缓存命中加载:           {warm_time:.3f} s")
+    print(f"  加速比: {plain_time / warm_time:.1f}x ({len(df)} 条记录)")
+
+
+def _legacy_prepare_features(df: pd.DataFrame, target: str = "cnt"):
+    """改造前的 prepare_features 路径：整表复制后两次 drop"""
+    data = df.copy()
+    X = data.drop(columns=[col for col in NON_FEATURE_COLUMNS if col in data.columns])
+    X = X.drop(columns=[target])
+    y = data[target]
+    return X, y
+
+
+def bench_prepare(args):
+    """prepare_features 列投影 vs 整表复制"""
+    base = DataLoader(data_dir=args.data_dir).load_hour_data()
+    df = replicate_rows(base, args.rows)
+    del base
+    print(f"原始数据: {len(df)} 条记录, {df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB")
+
+    preprocessor = DataPreprocessor()
+    cases = [
+        ("整表复制+两次drop (旧)", lambda: _legacy_prepare_features(df)),
+        ("列投影 (copy=False)", lambda: preprocessor.prepare_features(df)),
+        ("列投影 (copy=True)", lambda: preprocessor.prepare_features(df, copy=True)),
+    ]
+
+    print("\nprepare_features 内存基准:")
+    for label, func in cases:
+        peak_mb, elapsed, _ = peak_memory(func)
+        print(f"  {label:24s}: 峰值新增 {peak_mb:8.1f} MB, 耗时 {elapsed:.3f} s")
+
+
+def load_split(data_dir: str, test_size: float = 0.2, random_state: int = 42):
+    """
+    加载 hour.csv 并按训练流程相同的方式划分训练/测试集
+
+    Returns:
+        ((X_train, X_test, y_train, y_test), 特征列名)，数组均为float32
+    """
+    from sklearn.model_selection import train_test_split
+
+    df = DataLoader(data_dir=data_dir).load_hour_data()
+    X, y = DataPreprocessor().prepare_features(df)
+    return train_test_split(
+        X.to_numpy(dtype=np.float32), y.to_numpy(dtype=np.float32),
+        test_size=test_size, random_state=random_state
+    ), X.columns.tolist()
+
+
+def predict_latency(predict, X: np.ndarray, n_single: int = 200):
+    """
+    测量单行预测的中位延迟和整批预测耗时
+
+    Returns:
+        (单行中位延迟毫秒, 整批耗时秒数)
+    """
+    samples = []
+    for i in range(n_single):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        predict(row)
+        samples.append(time.perf_counter() - start)
+    batch_time, _ = timed(predict, X, repeat=1)
+    return float(np.median(samples)) * 1000, batch_time
+
+
+def rmse(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    """均方根误差"""
+    return float(np.sqrt(np.mean((y_true - y_pred) ** 2)))
+
+
+def bench_models(args):
+    """直方图梯度提升 vs 1000棵树的随机森林"""
+    (X_train, X_test, y_train, y_test), columns = load_split(args.data_dir)
+    registry = ModelRegistry.default()
+    models = {
+        'Random Forest (1000)': registry.get('Random Forest').build(42, columns),
+        'Gradient Boosting': registry.get('Gradient Boosting').build(42, columns),
+    }
+
+    rows = []
+    for name, model in models.items():
+        print(f"正在训练 {name}...")
+        fit_time, _ = timed(model.fit, X_train, y_train, repeat=1)
+        single_ms, batch_time = predict_latency(model.predict, X_test)
+        rows.append({
+            '模型': name,
+            '训练耗时(s)': round(fit_time, 2),
+            '单行预测(ms)': round(single_ms, 3),
+            f'批量预测{len(X_test)}行(s)': round(batch_time, 4),
+            '测试集RMSE': round(rmse(y_test, model.predict(X_test)), 2),
+        })
+
+    print("\n模型基准:")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+def bench_export(args):
+    """紧凑森林文件 vs pickle 的体积与加载耗时"""
+    import pickle
+
+    (X_train, _, y_train, _), columns = load_split(args.data_dir)
+    print("正在训练 Random Forest (1000)...")
+    model = ModelRegistry.default().get('Random Forest').build(42, columns)
+    model.fit(X_train, y_train)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pickle_path = os.path.join(tmp_dir, "forest.pkl")
+        forest_path = os.path.join(tmp_dir, "forest.forest")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        CompactForest.from_estimator(model, columns).save(forest_path)
+
+        def load_pickle():
+            with open(pickle_path, "rb") as f:
+                return pickle.load(f)
+
+        pickle_time, _ = timed(load_pickle, repeat=args.repeat)
+        mmap_time, _ = timed(CompactForest.load, forest_path, repeat=args.repeat)
+        read_time, _ = timed(CompactForest.load, forest_path, mmap=False, repeat=args.repeat)
+        pickle_mb = os.path.getsize(pickle_path) / 1024 ** 2
+        forest_mb = os.path.getsize(forest_path) / 1024 ** 2
+
+    print("\n森林序列化基准:")
+    print(f"  pickle:              {pickle_mb:7.2f} MB, 加载 {pickle_time * 1000:9.2f} ms")
+    print(f"  紧凑森林 (内存映射): {forest_mb:7.2f} MB, 加载 {mmap_time * 1000:9.2f} ms")
+    print(f"  紧凑森林 (读入内存): {forest_mb:7.2f} MB, 加载 {read_time * 1000:9.2f} ms")
+
+
+def bench_inference(args):
+    """向量化紧凑森林推理 vs RandomForestRegressor.predict"""
+    (X_train, X_test, y_train, _), columns = load_split(args.data_dir)
+    print("正在训练 Random Forest (1000)...")
+    model = ModelRegistry.default().get('Random Forest').build(42, columns)
+    model.fit(X_train, y_train)
+    forest = CompactForest.from_estimator(model, columns)
+
+    n_rows = 100_000
+    X_bulk = np.ascontiguousarray(np.resize(X_test, (n_rows, X_test.shape[1])))
+    max_diff = float(np.abs(forest.predict(X_test) - model.predict(X_test)).max())
+
+    rows = []
+    for name, predict in [('sklearn predict', model.predict), ('紧凑森林 (NumPy)', forest.predict)]:
+        single_ms, _ = predict_latency(predict, X_test)
+        bulk_time, _ = timed(predict, X_bulk, repeat=1)
+        rows.append({
+            '推理方式': name,
+            '单行预测(ms)': round(single_ms, 3),
+            f'批量{n_rows}行(s)': round(bulk_time, 2),
+            '吞吐(行/s)': int(n_rows / bulk_time),
+        })
+
+    print("\n推理基准 (1000棵树):")
+    print(pd.DataFrame(rows).to_string(index=False))
+    print(f"与 sklearn 预测的最大绝对差: {max_diff:.2e}")
+
+
+def bench_lookup(args):
+    """预计算查找表 vs 梯度提升模型预测"""
+    (X_train, X_test, y_train, y_test), columns = load_split(args.data_dir)
+    print("正在训练 Gradient Boosting...")
+    model = ModelRegistry.default().get('Gradient Boosting').build(42, columns)
+    model.fit(X_train, y_train)
+
+    table = PredictionLookupTable.build(model.predict, X_train, columns, levels=args.levels)
+    table.evaluate(model.predict, X_test)
+    table_pred = table.predict(X_test)
+    covered = ~np.isnan(table_pred)
+    print(f"测试集RMSE (覆盖的行): 模型 {rmse(y_test[covered], model.predict(X_test[covered])):.2f}, "
+          f"查找表 {rmse(y_test[covered], table_pred[covered]):.2f}")
+
+
+def bench_quantile(args):
+    """分位数森林区间预测 vs 普通森林预测"""
+    (X_train, X_test, y_train, y_test), columns = load_split(args.data_dir)
+    print("正在训练 Random Forest (1000)...")
+    model = ModelRegistry.default().get('Random Forest').build(42, columns)
+    model.fit(X_train, y_train)
+    forest = CompactForest.from_estimator(model, columns)
+
+    fit_time, quantile_forest = timed(QuantileForest.fit, forest, X_train, y_train, repeat=1)
+    coverage = quantile_forest.coverage(X_test, y_test, 0.1, 0.9)
+
+    n_rows = 100_000
+    X_bulk = np.ascontiguousarray(np.resize(X_test, (n_rows, X_test.shape[1])))
+    predict_time, _ = timed(forest.predict, X_bulk, repeat=1)
+    interval_time, _ = timed(quantile_forest.predict, X_bulk, repeat=1)
+    sklearn_time, _ = timed(model.predict, X_bulk, repeat=1)
+
+    print("\n分位数森林基准 (1000棵树):")
+    print(f"  叶子分位数统计耗时: {fit_time:.2f} s")
+    print(f"  测试集 P10-P90 区间覆盖率: {coverage:.1%} (名义 80%)")
+    print(f"  {n_rows}行: sklearn predict {sklearn_time:.2f} s, 紧凑森林 predict {predict_time:.2f} s, "
+          f"均值+P10/P50/P90 {interval_time:.2f} s")
+
+
+BENCHMARKS = {
+    'cache': bench_cache,
+    'prepare': bench_prepare,
+    'models': bench_models,
+    'export': bench_export,
+    'inference': bench_inference,
+    'lookup': bench_lookup,
+    'quantile': bench_quantile,
+}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="共享单车预测系统性能基准")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS), help="要运行的基准")
+    parser.add_argument('--data-dir', default="data", help="数据目录")
+    parser.add_argument('--scale', type=int, default=100, help="数据放大倍数")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="复制后的数据行数")
+    parser.add_argument('--levels', type=int, nargs=4, default=[5, 5, 4, 3],
+                        metavar=('TEMP', 'ATEMP', 'HUM', 'WIND'), help="查找表各天气特征的网格点数")
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
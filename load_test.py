@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+预测服务压测脚本
+用多个并发连接向本地预测服务发送单行预测请求，统计客户端延迟分位数和吞吐量
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.data_loader import DataLoader
+from src.data_preprocessor import PreprocessingArtifact
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                  method: str, path: str, payload=None) -> dict:
+    """
+    在已建立的keep-alive连接上发送一个请求并读取JSON响应
+
+    Returns:
+        响应体
+    """
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+async def client(host: str, port: int, rows: list, n_requests: int, latencies: list) -> None:
+    """单个并发客户端：顺序发送 n_requests 个单行请求"""
+    reader, writer = await asyncio.open_connection(host, port)
+    for i in range(n_requests):
+        start = time.perf_counter()
+        await request(reader, writer, "POST", "/predict", rows[i % len(rows)])
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def run(args) -> None:
+    """按参数执行压测并打印结果"""
+    artifact = PreprocessingArtifact.load(args.artifact)
+    df = DataLoader(data_dir=args.data_dir).load_hour_data()
+    rows = df[artifact.feature_columns].head(1000).astype(float).to_dict(orient="records")
+
+    latencies = []
+    per_client = args.requests // args.concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, rows[i::args.concurrency] or rows, per_client, latencies)
+        for i in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    server_stats = await request(reader, writer, "GET", "/stats")
+    writer.close()
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"\n压测结果 ({args.concurrency} 个并发连接, {len(latencies)} 个请求):")
+    print(f"  客户端吞吐量: {len(latencies) / elapsed:.0f} 请求/秒")
+    print(f"  客户端延迟 p50: {np.percentile(latencies_ms, 50):.2f} ms, "
+          f"p99: {np.percentile(latencies_ms, 99):.2f} ms")
+    print(f"  服务端统计: {json.dumps(server_stats, ensure_ascii=False)}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="预测服务压测")
+    parser.add_argument('--host', default="127.0.0.1", help="服务地址")
+    parser.add_argument('--port', type=int, default=8000, help="服务端口")
+    parser.add_argument('--concurrency', type=int, default=32, help="并发连接数")
+    parser.add_argument('--requests', type=int, default=10_000, help="总请求数")
+    parser.add_argument('--data-dir', default="data", help="数据目录（取样本行作为请求）")
+    parser.add_argument('--artifact', default=os.path.join("output", "artifacts", "preprocessing.json"),
+                        help="预处理产物文件（决定请求中的特征列）")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 使用机器学习模型预测共享单车租赁数量
 """
 
+import argparse
 import sys
 import os
 
@@ -11,13 +12,29 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.data_loader import DataLoader
-from src.data_preprocessor import DataPreprocessor
+from src.data_preprocessor import DEFAULT_LAGS, DEFAULT_SEASONAL_LAGS, DEFAULT_WINDOWS, DataPreprocessor
+from src.feature_store import FeatureStore
+from src.model_cache import ModelCache
+from src.model_registry import add_registry_arguments, registry_from_args
 from src.model_trainer import ModelTrainer
 from src.visualizer import Visualizer
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="共享单车租赁预测系统")
+    add_registry_arguments(parser)
+    parser.add_argument('--parallel', action='store_true', help="在进程池中并发训练各候选模型")
+    parser.add_argument('--compress-tolerance', type=float, default=None,
+                        help="训练后压缩随机森林：允许的袋外RMSE相对增幅（如0.01表示1%%）")
+    parser.add_argument('--no-cache', action='store_true', help="不读取也不写入模型缓存，总是重新训练")
+    return parser.parse_args()
+
+
 def main():
     """主函数"""
+    args = parse_args()
+    
     print("="*60)
     print("共享单车租赁预测系统")
     print("="*60)
@@ -28,11 +45,15 @@ def main():
     
     # 选择使用每日数据或每小时数据
     use_hourly = True  # 设置为True使用每小时数据，False使用每日数据
+    use_lag_features = False  # 设置为True添加滞后/滚动窗口特征（历史不足的行会被丢弃）
+    adaptive_forest = False  # 设置为True按袋外误差自适应选择随机森林的树数量
     
     if use_hourly:
         df = data_loader. load_hour_data()
+        source_path = os.path.join("data", "hour.csv")
     else:
         df = data_loader.load_day_data()
+        source_path = os.path.join("data", "day.csv")
     
     # 显示数据信息
     data_loader.get_data_info(df)
@@ -40,15 +61,37 @@ def main():
     # 2. 数据预处理
     print("\n[步骤 2] 数据预处理...")
     preprocessor = DataPreprocessor()
+    if use_lag_features:
+        df = preprocessor.add_lag_features(df, target="cnt").dropna().reset_index(drop=True)
     X, y = preprocessor.prepare_features(df, target="cnt")
+    preprocess_config = {
+        'target': 'cnt',
+        'lag_features': {
+            'lags': DEFAULT_LAGS, 'seasonal_lags': DEFAULT_SEASONAL_LAGS, 'windows': DEFAULT_WINDOWS,
+        } if use_lag_features else None,
+    }
     
-    # 特征标准化
-    X_scaled, _ = preprocessor.scale_features(X)
+    # 写入内存映射特征库，释放中间DataFrame，后续训练和分析脚本零拷贝共享
+    feature_store = FeatureStore(store_dir=os.path.join("output", "feature_store"))
+    feature_store.save(X, y, preprocessor.feature_columns, source_path=source_path, config=preprocess_config)
+    del df, X, y
     
-    # 3. 模型训练
+    # 3. 模型训练（标准化只对需要它的模型在训练集上进行）
     print("\n[步骤 3] 模型训练...")
-    trainer = ModelTrainer(random_state=42)
-    results = trainer.train_models(X_scaled, y, test_size=0.2)
+    model_cache = None if args.no_cache else ModelCache(os.path.join("output", "model_cache"))
+    trainer = ModelTrainer(random_state=42, preprocessor=preprocessor,
+                           registry=registry_from_args(args), cache=model_cache)
+    results = trainer.train_from_store(feature_store, test_size=0.2, adaptive_forest=adaptive_forest,
+                                       model_names=args.models, max_cost=args.max_cost,
+                                       parallel=args.parallel)
+    if args.compress_tolerance is not None and 'Random Forest' in trainer.models:
+        trainer.compress_forest(tolerance=args.compress_tolerance)
+    
+    # 保存最佳模型的预处理产物，推理时直接加载，无需重新拟合
+    trainer.get_best_artifact().save(os.path.join("output", "artifacts", "preprocessing.json"))
+    trainer.save_best_model(os.path.join("output", "artifacts", "best_model.joblib"))
+    if 'Random Forest' in trainer.models:
+        trainer.export_forest(os.path.join("output", "artifacts", "random_forest.forest"))
     
     # 4. 可视化结果
     print("\n[步骤 4] 生成可视化结果...")
@@ -70,11 +113,15 @@ def main():
     # 绘制模型对比
     visualizer.plot_model_comparison(results)
     
-    # 绘制特征重要性
+    # 绘制特征重要性（注明来源模型；无法计算时跳过）
     if trainer.best_model is not None:
-        feature_importance = trainer.get_feature_importance()
-        importance_df = preprocessor.get_feature_importance_data(feature_importance)
-        visualizer.plot_feature_importance(importance_df, top_n=10)
+        try:
+            feature_importance, importance_source = trainer.get_feature_importance()
+        except ValueError as exc:
+            print(f"跳过特征重要性图: {exc}")
+        else:
+            importance_df = preprocessor.get_feature_importance_data(feature_importance)
+            visualizer.plot_feature_importance(importance_df, top_n=10, source=importance_source)
     
     # 5. 总结
     print("\n" + "="*60)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+共享单车租赁预测服务
+加载 main.py 保存的最佳模型和预处理产物，启动本地微批次HTTP预测服务
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.prediction_service import PredictionService, serve_prefork
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="共享单车租赁预测服务")
+    parser.add_argument('--host', default="127.0.0.1", help="监听地址")
+    parser.add_argument('--port', type=int, default=8000, help="监听端口")
+    parser.add_argument('--model', default=os.path.join("output", "artifacts", "best_model.joblib"),
+                        help="模型文件（.forest 为紧凑森林）")
+    parser.add_argument('--artifact', default=os.path.join("output", "artifacts", "preprocessing.json"),
+                        help="预处理产物文件")
+    parser.add_argument('--max-batch-size', type=int, default=64, help="每个微批次的最大请求数")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help="凑批次时的最长等待时间（毫秒）")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="工作进程数（大于1时预先fork，各进程共享内存映射的模型；0表示CPU核心数）")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    service = PredictionService.from_files(args.model, args.artifact,
+                                           max_batch_size=args.max_batch_size,
+                                           max_wait_ms=args.max_wait_ms)
+    if args.workers != 1:
+        with tempfile.TemporaryDirectory() as shared_dir:
+            service.share_model(shared_dir)
+            serve_prefork(service, args.host, args.port, workers=args.workers or None)
+        return
+    
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n预测服务已停止")
+        print(service.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+列式缓存模块
+将解析后的CSV按列保存为NumPy二进制文件，源文件未变化时直接复用，跳过文本解析
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# 缓存格式版本，格式变化时递增以使旧缓存全部失效
+CACHE_FORMAT_VERSION = 1
+
+
+class ColumnarCache:
+    """列式缓存类
+
+    每个源文件对应缓存目录下的一个子目录，其中每列一个 .npy 文件，
+    外加一个 meta.json 记录源文件指纹。meta.json 最后写入，作为缓存完整的标志。
+
+    失效规则：源文件大小、修改时间(纳秒)、列类型声明或缓存格式版本任一变化即失效；
+    开启 verify_hash 时还会比对源文件内容的 SHA-256（适用于修改时间不可靠的场景）。
+    内容哈希只在开启 verify_hash 时计算和写入，未开启时冷加载不会再读一遍源文件；
+    未记录哈希的缓存在开启校验后视为未命中并重建。
+    """
+    
+    META_FILE = "meta.json"
+    
+    def __init__(self, cache_dir: str, verify_hash: bool = False):
+        """
+        初始化列式缓存
+        
+        Args:
+            cache_dir: 缓存根目录
+            verify_hash: 命中前是否额外校验源文件内容哈希
+        """
+        self.cache_dir = cache_dir
+        self.verify_hash = verify_hash
+    
+    def load(self, source_path: str, dtypes: Dict[str, str]) -> Optional[pd.DataFrame]:
+        """
+        读取缓存
+        
+        Args:
+            source_path: 源CSV文件路径
+            dtypes: 解析时使用的列类型声明
+            
+        Returns:
+            命中时返回DataFrame，未命中或已失效时返回None
+        """
+        entry_dir = self._entry_dir(source_path)
+        meta_path = os.path.join(entry_dir, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if not self._is_valid(meta, source_path, dtypes):
+            return None
+        
+        try:
+            data = {
+                col: np.load(os.path.join(entry_dir, f"{i}.npy"), allow_pickle=False)
+                for i, col in enumerate(meta['columns'])
+            }
+        except (OSError, ValueError):
+            return None
+        
+        return pd.DataFrame(data, copy=False)
+    
+    def save(self, source_path: str, df: pd.DataFrame, dtypes: Dict[str, str]) -> bool:
+        """
+        写入缓存
+        
+        Args:
+            source_path: 源CSV文件路径
+            df: 解析后的DataFrame
+            dtypes: 解析时使用的列类型声明
+            
+        Returns:
+            是否成功写入（含非数值列时不缓存）
+        """
+        for col in df.columns:
+            kind = df[col].dtype.kind
+            if kind not in "biufM":
+                return False
+        
+        entry_dir = self._entry_dir(source_path)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.makedirs(entry_dir, exist_ok=True)
+        
+        for i, col in enumerate(df.columns):
+            np.save(os.path.join(entry_dir, f"{i}.npy"), df[col].to_numpy(), allow_pickle=False)
+        
+        meta = self._fingerprint(source_path, dtypes, with_hash=self.verify_hash)
+        meta['columns'] = list(df.columns)
+        with open(os.path.join(entry_dir, self.META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        
+        return True
+    
+    def clear(self, source_path: Optional[str] = None) -> None:
+        """
+        清除缓存
+        
+        Args:
+            source_path: 指定源文件时只清除该文件的缓存，否则清除全部
+        """
+        target = self._entry_dir(source_path) if source_path else self.cache_dir
+        if os.path.exists(target):
+            shutil.rmtree(target)
+    
+    def _entry_dir(self, source_path: str) -> str:
+        """获取源文件对应的缓存子目录"""
+        return os.path.join(self.cache_dir, os.path.basename(source_path))
+    
+    def _fingerprint(self, source_path: str, dtypes: Dict[str, str], with_hash: bool) -> Dict:
+        """
+        计算源文件指纹
+        
+        Args:
+            source_path: 源CSV文件路径
+            dtypes: 列类型声明
+            with_hash: 是否计算内容哈希
+            
+        Returns:
+            指纹字典
+        """
+        stat = os.stat(source_path)
+        fingerprint = {
+            'version': CACHE_FORMAT_VERSION,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'dtypes': dict(sorted(dtypes.items())),
+        }
+        if with_hash:
+            fingerprint['sha256'] = _file_sha256(source_path)
+        return fingerprint
+    
+    def _is_valid(self, meta: Dict, source_path: str, dtypes: Dict[str, str]) -> bool:
+        """判断缓存元数据是否与当前源文件一致"""
+        current = self._fingerprint(source_path, dtypes, with_hash=False)
+        for key, value in current.items():
+            if meta.get(key) != value:
+                return False
+        
+        if self.verify_hash:
+            # 未开启校验时写入的缓存没有内容哈希，直接视为未命中，不再读取源文件
+            if 'sha256' not in meta or meta['sha256'] != _file_sha256(source_path):
+                return False
+        
+        return True
+
+
+def _file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """分块计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
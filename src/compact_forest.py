@@ -0,0 +1,457 @@
+"""
+紧凑森林模块
+将训练好的随机森林导出为单个可内存映射的文件：所有树的节点按
+(feature, threshold, left, right, value) 拼接成连续扁平数组，
+加载时只需映射文件，无需反序列化，多个进程可共享同一份页缓存
+"""
+
+import json
+import os
+import struct
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+
+class CompactForest:
+    """扁平数组表示的回归森林类
+    
+    文件布局:
+        8字节魔数 | 8字节头部长度 | JSON头部 | 按64字节对齐的各数组原始数据
+    
+    节点编号在所有树之间全局连续，roots[i] 为第 i 棵树根节点的全局编号。
+    每棵树内节点按层序重新编号，兄弟节点相邻（right = left + 1），遍历时
+    下一节点可直接由 left + (x > threshold) 得到，只需一次子节点gather。
+    叶子节点的左右子节点都指向自身、阈值为 +inf，便于逐层同步遍历时原地停留。
+    阈值为不超过原始 float64 阈值的最大 float32，因此对 float32 输入的
+    “x <= threshold” 判断与 scikit-learn 完全一致。
+    """
+    
+    MAGIC = b"BFOREST2"
+    ALIGNMENT = 64
+    ARRAYS = (
+        ('roots', np.int32),
+        ('feature', np.int32),
+        ('threshold', np.float32),
+        ('left', np.int32),
+        ('right', np.int32),
+        ('value', np.float32),
+    )
+    
+    def __init__(self, roots: np.ndarray, feature: np.ndarray, threshold: np.ndarray,
+                 left: np.ndarray, right: np.ndarray, value: np.ndarray,
+                 n_features: int, max_depth: int, feature_names: Optional[List[str]] = None):
+        """
+        初始化紧凑森林
+        
+        Args:
+            roots: 各树根节点的全局编号
+            feature: 各节点的分裂特征
+            threshold: 各节点的分裂阈值
+            left: 左子节点全局编号
+            right: 右子节点全局编号
+            value: 各节点的预测值
+            n_features: 特征数量
+            max_depth: 所有树的最大深度
+            feature_names: 特征列名
+        """
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.n_features = n_features
+        self.max_depth = max_depth
+        self.feature_names = feature_names
+    
+    @property
+    def n_trees(self) -> int:
+        """树的数量"""
+        return len(self.roots)
+    
+    @property
+    def n_nodes(self) -> int:
+        """所有树的节点总数"""
+        return len(self.feature)
+    
+    @property
+    def nbytes(self) -> int:
+        """各数组占用的总字节数"""
+        return sum(getattr(self, name).nbytes for name, _ in self.ARRAYS)
+    
+    @staticmethod
+    def supports(model) -> bool:
+        """
+        是否可以导出为紧凑森林：已训练的单输出 RandomForestRegressor 或 ExtraTreesRegressor
+        
+        梯度提升、Bagging、Stacking、Voting 等同样有 estimators_ 属性，但预测不是各树的简单平均，不能导出。
+        
+        Args:
+            model: 任意模型
+        
+        Returns:
+            是否支持
+        """
+        return (isinstance(model, (RandomForestRegressor, ExtraTreesRegressor))
+                and hasattr(model, "estimators_") and getattr(model, "n_outputs_", 1) == 1)
+    
+    @classmethod
+    def from_estimator(cls, model, feature_names: Optional[List[str]] = None) -> "CompactForest":
+        """
+        从训练好的 RandomForestRegressor（或 ExtraTreesRegressor）构建紧凑森林
+        
+        Args:
+            model: 已训练的 RandomForestRegressor 或 ExtraTreesRegressor
+            feature_names: 特征列名
+        
+        Returns:
+            紧凑森林
+        """
+        if not cls.supports(model):
+            raise ValueError(f"{type(model).__name__} 不是已训练的单输出随机森林，无法导出")
+        
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("只支持单输出回归森林")
+        
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        n_nodes = int(sizes.sum())
+        
+        feature = np.empty(n_nodes, dtype=np.int32)
+        threshold = np.empty(n_nodes, dtype=np.float32)
+        left = np.empty(n_nodes, dtype=np.int32)
+        right = np.empty(n_nodes, dtype=np.int32)
+        value = np.empty(n_nodes, dtype=np.float32)
+        
+        for tree, offset, size in zip(trees, offsets, sizes):
+            order, new_left = _level_order(tree.children_left, tree.children_right)
+            block = slice(offset, offset + size)
+            is_leaf = tree.children_left[order] == -1
+            
+            feature[block] = np.where(is_leaf, 0, tree.feature[order])
+            threshold[block] = np.where(is_leaf, np.inf, _float32_floor(tree.threshold[order]))
+            left[block] = new_left + offset
+            right[block] = np.where(is_leaf, new_left, new_left + 1) + offset
+            value[block] = tree.value[order, 0, 0]
+        
+        if feature_names is None and hasattr(model, "feature_names_in_"):
+            feature_names = list(model.feature_names_in_)
+        
+        return cls(
+            roots=offsets.astype(np.int32), feature=feature, threshold=threshold,
+            left=left, right=right, value=value,
+            n_features=int(model.n_features_in_),
+            max_depth=int(max(tree.max_depth for tree in trees)),
+            feature_names=feature_names,
+        )
+    
+    def apply(self, X: Union[pd.DataFrame, np.ndarray], block_size: Optional[int] = None) -> np.ndarray:
+        """
+        计算每行样本在每棵树中落入的叶子节点（全局编号）
+        
+        所有树 × 一批样本同步逐层向下遍历：每层对节点编号矩阵做一次特征/阈值/子节点的
+        向量化gather，共 max_depth 层，没有逐树或逐行的Python循环。叶子节点指向自身，
+        提前到达叶子的路径在后续层中原地停留。
+        
+        Args:
+            X: 特征数据（列顺序与训练时一致），内部转换为float32
+            block_size: 每批样本数，默认使节点编号矩阵约为 2^18 个元素
+            
+        Returns:
+            叶子节点编号矩阵 (n_samples, n_trees)
+        """
+        X = self._as_float32(X)
+        n_samples = len(X)
+        if block_size is None:
+            block_size = max(1, (1 << 18) // self.n_trees)
+        
+        leaves = np.empty((n_samples, self.n_trees), dtype=np.int32)
+        for start in range(0, n_samples, block_size):
+            block = X[start:start + block_size]
+            leaves[start:start + len(block)] = self._traverse(block).T
+        return leaves
+    
+    def predict(self, X: Union[pd.DataFrame, np.ndarray], block_size: Optional[int] = None) -> np.ndarray:
+        """
+        预测（各树叶子值的平均）
+        
+        Args:
+            X: 特征数据（列顺序与训练时一致），内部转换为float32
+            block_size: 每批样本数，默认使节点编号矩阵约为 2^18 个元素
+            
+        Returns:
+            预测值数组（float64，与scikit-learn一致）
+        """
+        X = self._as_float32(X)
+        n_samples = len(X)
+        if block_size is None:
+            block_size = max(1, (1 << 18) // self.n_trees)
+        
+        predictions = np.empty(n_samples, dtype=np.float64)
+        for start in range(0, n_samples, block_size):
+            block = X[start:start + block_size]
+            nodes = self._traverse(block)
+            predictions[start:start + len(block)] = self.value[nodes].sum(axis=0, dtype=np.float64)
+        predictions /= self.n_trees
+        return predictions
+    
+    def _traverse(self, X: np.ndarray) -> np.ndarray:
+        """对一批float32样本同步遍历所有树，返回叶子节点编号矩阵 (n_trees, n_rows)"""
+        n_rows = len(X)
+        X_flat = X.ravel()
+        row_offsets = np.arange(n_rows, dtype=np.int32) * np.int32(self.n_features)
+        nodes = np.repeat(np.asarray(self.roots)[:, None], n_rows, axis=1)
+        
+        for _ in range(self.max_depth):
+            values = X_flat[row_offsets + self.feature[nodes]]
+            nodes = self.left[nodes] + (values > self.threshold[nodes])
+        return nodes
+    
+    def _as_float32(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """转换为行优先的float32矩阵并检查特征数量"""
+        if isinstance(X, pd.DataFrame):
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            X = X.to_numpy(dtype=np.float32)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"特征数量不匹配: 期望 {self.n_features}, 实际 {X.shape[1]}")
+        if np.isnan(X).any():
+            raise ValueError("输入包含缺失值，紧凑森林不支持缺失值")
+        return X
+    
+    def select(self, tree_indices) -> "CompactForest":
+        """
+        取出部分树组成新的紧凑森林（节点重新编号为连续区间）
+        
+        Args:
+            tree_indices: 要保留的树编号
+        
+        Returns:
+            新的紧凑森林
+        """
+        tree_indices = np.asarray(tree_indices, dtype=np.int64)
+        ends = np.append(self.roots[1:], self.n_nodes).astype(np.int64)
+        starts = self.roots.astype(np.int64)
+        
+        blocks = [np.arange(starts[i], ends[i]) for i in tree_indices]
+        sizes = np.array([len(block) for block in blocks])
+        new_roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        nodes = np.concatenate(blocks)
+        shift = np.repeat(new_roots - starts[tree_indices], sizes)
+        
+        return CompactForest(
+            roots=new_roots.astype(np.int32),
+            feature=self.feature[nodes].copy(),
+            threshold=self.threshold[nodes].copy(),
+            left=(self.left[nodes] + shift).astype(np.int32),
+            right=(self.right[nodes] + shift).astype(np.int32),
+            value=self.value[nodes].copy(),
+            n_features=self.n_features,
+            max_depth=self.max_depth,
+            feature_names=self.feature_names,
+        )
+    
+    def save(self, path: str) -> None:
+        """
+        写入单个紧凑森林文件（先写临时文件再原子替换）
+        
+        Args:
+            path: 文件路径
+        """
+        header = {
+            'n_trees': self.n_trees,
+            'n_nodes': self.n_nodes,
+            'n_features': self.n_features,
+            'max_depth': self.max_depth,
+            'feature_names': self.feature_names,
+            'arrays': {},
+        }
+        
+        # 头部中的偏移量依赖头部本身的长度，先按占位长度计算再回填
+        header_size = self._layout(header, 0)
+        encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        while self._data_start(len(encoded)) != header_size:
+            header_size = self._layout(header, len(encoded))
+            encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack("<Q", len(encoded)))
+            f.write(encoded)
+            for name, dtype in self.ARRAYS:
+                f.seek(header['arrays'][name]['offset'])
+                f.write(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes())
+        os.replace(tmp_path, path)
+        
+        print(f"紧凑森林已导出: {path} ({self.n_trees} 棵树, {self.n_nodes} 个节点, "
+              f"{os.path.getsize(path) / 1024 ** 2:.2f} MB)")
+    
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompactForest":
+        """
+        加载紧凑森林文件
+        
+        Args:
+            path: 文件路径
+            mmap: 是否以只读内存映射方式打开（零拷贝，进程间共享页缓存）
+        
+        Returns:
+            紧凑森林
+        
+        Raises:
+            ValueError: 如果文件格式不正确
+        """
+        with open(path, "rb") as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f"不是紧凑森林文件: {path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        
+        if mmap:
+            buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            buffer = np.fromfile(path, dtype=np.uint8)
+        
+        arrays = {}
+        for name, dtype in cls.ARRAYS:
+            info = header['arrays'][name]
+            start = info['offset']
+            arrays[name] = buffer[start:start + info['nbytes']].view(dtype)
+        
+        return cls(**arrays, n_features=header['n_features'], max_depth=header['max_depth'],
+                   feature_names=header.get('feature_names'))
+    
+    def _layout(self, header: Dict, header_len: int) -> int:
+        """按给定头部长度计算各数组的对齐偏移量，返回数据区起始位置"""
+        offset = self._data_start(header_len)
+        start = offset
+        for name, dtype in self.ARRAYS:
+            nbytes = getattr(self, name).size * np.dtype(dtype).itemsize
+            header['arrays'][name] = {'offset': offset, 'nbytes': nbytes}
+            offset = _align(offset + nbytes, self.ALIGNMENT)
+        return start
+    
+    @classmethod
+    def _data_start(cls, header_len: int) -> int:
+        """数据区起始位置（魔数 + 长度字段 + 头部，按64字节对齐）"""
+        return _align(len(cls.MAGIC) + 8 + header_len, cls.ALIGNMENT)
+
+
+def _align(offset: int, alignment: int) -> int:
+    """向上对齐到 alignment 的整数倍"""
+    return -(-offset // alignment) * alignment
+
+
+def select_trees(forest: CompactForest, X: Union[pd.DataFrame, np.ndarray],
+                 y: Union[pd.Series, np.ndarray], tolerance: float = 0.01,
+                 max_trees: Optional[int] = None, oob_mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    贪心前向选择树子集，直到子集平均预测的RMSE不超过完整森林RMSE的 (1 + tolerance) 倍
+    
+    评估数据按行交替分成两半：偶数行用于每步挑选使RMSE最小的树，奇数行用于判断
+    是否达到容差，避免在同一批数据上既挑选又验收导致过于乐观。各树预测由一次
+    向量化叶子gather得到 (n_samples, n_trees)，每步对所有候选树做一次矩阵运算。
+    
+    传入 oob_mask 时评估数据应为森林的训练集：每行只对该行在袋外的树取平均
+    （即袋外预测），完整森林的RMSE也取袋外RMSE；尚无袋外树的行以目标均值作为预测，
+    没有任何袋外树的行不参与评估。
+    
+    Args:
+        forest: 完整的紧凑森林
+        X: 评估数据
+        y: 评估数据的真实值
+        tolerance: 允许的RMSE相对增幅
+        max_trees: 最多选择的树数量，默认不限
+        oob_mask: 形状为 (n_samples, n_trees) 的布尔数组，True 表示该行不在该树的自助样本中
+        
+    Returns:
+        选中的树编号（按加入顺序）
+    """
+    y = np.asarray(y, dtype=np.float64)
+    tree_predictions = forest.value[forest.apply(X)].astype(np.float64)
+    if oob_mask is None:
+        weights = np.ones(tree_predictions.shape)
+    else:
+        weights = np.asarray(oob_mask, dtype=np.float64)
+        covered = weights.any(axis=1)
+        tree_predictions, weights, y = tree_predictions[covered], weights[covered], y[covered]
+        tree_predictions *= weights
+    
+    rank_pred, check_pred = tree_predictions[0::2], tree_predictions[1::2]
+    rank_weight, check_weight = weights[0::2], weights[1::2]
+    rank_y, check_y = y[0::2], y[1::2]
+    fallback = float(y.mean())
+    
+    full_rmse = np.sqrt(np.mean((check_pred.sum(axis=1) / check_weight.sum(axis=1) - check_y) ** 2))
+    target_rmse = full_rmse * (1 + tolerance)
+    max_trees = min(max_trees or forest.n_trees, forest.n_trees)
+    
+    selected = []
+    available = np.ones(forest.n_trees, dtype=bool)
+    rank_sum, rank_count = np.zeros(len(rank_y)), np.zeros(len(rank_y))
+    check_sum, check_count = np.zeros(len(check_y)), np.zeros(len(check_y))
+    for _ in range(max_trees):
+        candidate_sum = rank_sum[:, None] + rank_pred
+        candidate_count = rank_count[:, None] + rank_weight
+        candidate = np.where(candidate_count > 0, candidate_sum / np.maximum(candidate_count, 1), fallback)
+        candidate_mse = np.mean((candidate - rank_y[:, None]) ** 2, axis=0)
+        candidate_mse[~available] = np.inf
+        best = int(np.argmin(candidate_mse))
+        selected.append(best)
+        available[best] = False
+        rank_sum += rank_pred[:, best]
+        rank_count += rank_weight[:, best]
+        check_sum += check_pred[:, best]
+        check_count += check_weight[:, best]
+        check = np.where(check_count > 0, check_sum / np.maximum(check_count, 1), fallback)
+        if np.sqrt(np.mean((check - check_y) ** 2)) <= target_rmse:
+            break
+    
+    return np.array(selected)
+
+
+def _level_order(children_left: np.ndarray, children_right: np.ndarray) -> tuple:
+    """
+    按层序重新编号一棵树的节点，同一父节点的左右子节点编号相邻
+    
+    Args:
+        children_left: 原左子节点编号（叶子为-1）
+        children_right: 原右子节点编号（叶子为-1）
+        
+    Returns:
+        (order, new_left): order[i] 为新编号 i 对应的原节点，
+        new_left[i] 为新编号 i 的左子节点新编号（叶子为自身）
+    """
+    levels = []
+    frontier = np.array([0])
+    while len(frontier):
+        levels.append(frontier)
+        internal = frontier[children_left[frontier] != -1]
+        frontier = np.column_stack([children_left[internal], children_right[internal]]).ravel()
+    order = np.concatenate(levels)
+    
+    new_id = np.empty(len(order), dtype=np.int64)
+    new_id[order] = np.arange(len(order))
+    old_left = children_left[order]
+    new_left = np.where(old_left == -1, np.arange(len(order)), new_id[np.maximum(old_left, 0)])
+    return order, new_left.astype(np.int32)
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+    """不超过原值的最大 float32（保证 float32 输入的 <= 比较结果不变）"""
+    rounded = values.astype(np.float32)
+    too_big = rounded.astype(np.float64) > values
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
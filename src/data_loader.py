@@ -5,57 +5,250 @@
 
 import pandas as pd
 import os
-from typing import Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
+
+from .column_cache import ColumnarCache
+
+
+# 共享单车数据列的紧凑类型声明：类别编码用int8，计数用无符号整型，
+# 天气数值用float32，日期解析为datetime64，在解析阶段直接生效
+BIKE_SHARING_SCHEMA: Dict[str, str] = {
+    'instant': 'uint32',
+    'season': 'int8',
+    'yr': 'int8',
+    'mnth': 'int8',
+    'hr': 'int8',
+    'holiday': 'int8',
+    'weekday': 'int8',
+    'workingday': 'int8',
+    'weathersit': 'int8',
+    'temp': 'float32',
+    'atemp': 'float32',
+    'hum': 'float32',
+    'windspeed': 'float32',
+    'casual': 'uint16',
+    'registered': 'uint16',
+    'cnt': 'uint16',
+}
+
+# 每日聚合后的计数可能超出uint16范围（多城市数据），单独放宽
+DAY_SCHEMA_OVERRIDES: Dict[str, str] = {
+    'casual': 'uint32',
+    'registered': 'uint32',
+    'cnt': 'uint32',
+}
+
+DATE_COLUMNS: List[str] = ['dteday']
 
 
 class DataLoader:
     """数据加载器类"""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", use_cache: bool = True,
+                 cache_dir: Optional[str] = None, verify_hash: bool = False):
         """
         初始化数据加载器
         
         Args:
             data_dir: 数据文件所在目录
+            use_cache: 是否启用列式二进制缓存（仅对紧凑类型解析生效）
+            cache_dir: 缓存目录，默认为 data_dir/.cache
+            verify_hash: 命中缓存前是否校验源文件内容哈希
         """
         self.data_dir = data_dir
+        self.cache = None
+        if use_cache:
+            self.cache = ColumnarCache(
+                cache_dir or os.path.join(data_dir, ".cache"),
+                verify_hash=verify_hash
+            )
     
-    def load_day_data(self) -> pd.DataFrame:
+    def load_day_data(self, typed: bool = True) -> pd.DataFrame:
         """
         加载按天聚合的数据
         
+        Args:
+            typed: 是否在解析时应用紧凑类型声明
+        
         Returns:
             包含每日数据的DataFrame
             
         Raises:
             FileNotFoundError: 如果数据文件不存在
         """
-        file_path = os.path.join(self.data_dir, "day.csv")
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"数据文件不存在: {file_path}")
-        
-        df = pd.read_csv(file_path)
+        df = self._read_csv("day.csv", typed, DAY_SCHEMA_OVERRIDES)
         print(f"成功加载每日数据: {len(df)} 条记录")
         return df
     
-    def load_hour_data(self) -> pd.DataFrame:
+    def load_hour_data(self, typed: bool = True) -> pd.DataFrame:
         """
         加载按小时聚合的数据
         
+        Args:
+            typed: 是否在解析时应用紧凑类型声明
+        
         Returns:
             包含每小时数据的DataFrame
             
         Raises:
             FileNotFoundError: 如果数据文件不存在
         """
-        file_path = os.path.join(self.data_dir, "hour.csv")
+        df = self._read_csv("hour.csv", typed)
+        print(f"成功加载每小时数据: {len(df)} 条记录")
+        return df
+    
+    def iter_hour_data(self, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """
+        分块流式加载按小时聚合的数据，内存占用只与块大小有关
+        
+        Args:
+            chunksize: 每块的记录数
+            
+        Yields:
+            应用紧凑类型声明后的数据块
+            
+        Raises:
+            FileNotFoundError: 如果数据文件不存在
+        """
+        return self._iter_csv("hour.csv", chunksize)
+    
+    def iter_day_data(self, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """
+        分块流式加载按天聚合的数据
+        
+        Args:
+            chunksize: 每块的记录数
+            
+        Yields:
+            应用紧凑类型声明后的数据块
+            
+        Raises:
+            FileNotFoundError: 如果数据文件不存在
+        """
+        return self._iter_csv("day.csv", chunksize, DAY_SCHEMA_OVERRIDES)
+    
+    def _iter_csv(self, file_name: str, chunksize: int,
+                  overrides: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        按块读取CSV文件的生成器（文件检查在调用时立即进行）
+        
+        Args:
+            file_name: 数据文件名
+            chunksize: 每块的记录数
+            overrides: 覆盖默认声明的列类型
+            
+        Returns:
+            数据块迭代器
+        """
+        file_path = self._get_file_path(file_name)
+        dtypes, date_columns = self._resolve_schema(file_path, overrides)
+        
+        def generate() -> Iterator[pd.DataFrame]:
+            with pd.read_csv(file_path, dtype=dtypes, parse_dates=date_columns,
+                             chunksize=chunksize) as reader:
+                for chunk in reader:
+                    yield chunk
+        
+        return generate()
+    
+    def _get_file_path(self, file_name: str) -> str:
+        """
+        获取数据文件路径并检查其存在性
+        
+        Args:
+            file_name: 数据文件名
+            
+        Returns:
+            数据文件完整路径
+            
+        Raises:
+            FileNotFoundError: 如果数据文件不存在
+        """
+        file_path = os.path.join(self.data_dir, file_name)
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"数据文件不存在: {file_path}")
+        return file_path
+    
+    def _resolve_schema(self, file_path: str,
+                        overrides: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, str], List[str]]:
+        """
+        根据文件表头筛选出实际存在的列的类型声明
         
-        df = pd.read_csv(file_path)
-        print(f"成功加载每小时数据: {len(df)} 条记录")
+        Args:
+            file_path: 数据文件路径
+            overrides: 覆盖默认声明的列类型
+            
+        Returns:
+            (列类型字典, 需要解析为日期的列)
+        """
+        header = pd.read_csv(file_path, nrows=0).columns
+        schema = {**BIKE_SHARING_SCHEMA, **(overrides or {})}
+        dtypes = {col: dtype for col, dtype in schema.items() if col in header}
+        date_columns = [col for col in DATE_COLUMNS if col in header]
+        return dtypes, date_columns
+    
+    def _read_csv(self, file_name: str, typed: bool = True,
+                  overrides: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        读取CSV文件，可选地在解析阶段应用类型声明
+        
+        Args:
+            file_name: 数据文件名
+            typed: 是否应用紧凑类型声明
+            overrides: 覆盖默认声明的列类型
+            
+        Returns:
+            解析后的DataFrame
+        """
+        file_path = self._get_file_path(file_name)
+        if not typed:
+            return pd.read_csv(file_path)
+        
+        dtypes, date_columns = self._resolve_schema(file_path, overrides)
+        if self.cache is not None:
+            df = self.cache.load(file_path, dtypes)
+            if df is not None:
+                print(f"命中列式缓存: {file_name}")
+                return df
+        
+        df = pd.read_csv(file_path, dtype=dtypes, parse_dates=date_columns)
+        if self.cache is not None:
+            self.cache.save(file_path, df, dtypes)
         return df
     
+    def report_memory_savings(self, file_name: str = "hour.csv") -> Dict[str, float]:
+        """
+        对比默认解析与紧凑类型解析的内存占用
+        
+        Args:
+            file_name: 数据文件名
+            
+        Returns:
+            包含两种方式内存占用(MB)和压缩比的字典
+        """
+        overrides = DAY_SCHEMA_OVERRIDES if file_name == "day.csv" else None
+        file_path = self._get_file_path(file_name)
+        dtypes, date_columns = self._resolve_schema(file_path, overrides)
+        raw_df = pd.read_csv(file_path)
+        typed_df = pd.read_csv(file_path, dtype=dtypes, parse_dates=date_columns)
+        
+        raw_mb = raw_df.memory_usage(deep=True).sum() / 1024 ** 2
+        typed_mb = typed_df.memory_usage(deep=True).sum() / 1024 ** 2
+        
+        report = {
+            'raw_mb': raw_mb,
+            'typed_mb': typed_mb,
+            'saved_mb': raw_mb - typed_mb,
+            'ratio': raw_mb / typed_mb if typed_mb > 0 else float('inf')
+        }
+        
+        print(f"\n{file_name} 内存占用对比:")
+        print(f"  默认解析: {raw_mb:.2f} MB")
+        print(f"  紧凑类型: {typed_mb:.2f} MB")
+        print(f"  节省内存: {report['saved_mb']:.2f} MB (压缩比 {report['ratio']:.1f}x)")
+        
+        return report
+    
     def get_data_info(self, df: pd.DataFrame) -> None:
         """
         打印数据基本信息
@@ -74,7 +267,7 @@ class DataLoader:
         print(df.dtypes)
         print(f"\n缺失值统计:")
         print(df.isnull().sum())
+        print(f"\n内存占用: {df.memory_usage(deep=True).sum() / 1024 ** 2:.2f} MB")
         print(f"\n数据统计摘要:")
         print(df.describe())
         print("="*50 + "\n")
-
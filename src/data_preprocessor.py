@@ -3,12 +3,376 @@
 负责特征工程和数据清洗
 """
 
+import json
+import os
 import pandas as pd
 import numpy as np
-from typing import Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple, Optional, Union
 from sklearn.preprocessing import StandardScaler
 
 
+# 不参与建模的列：记录索引、日期以及构成cnt的两个分量
+NON_FEATURE_COLUMNS = ['instant', 'dteday', 'casual', 'registered']
+
+# 默认的滞后特征配置（单位：小时；day.csv 中单位为天）
+DEFAULT_LAGS = (1, 2, 3)
+DEFAULT_SEASONAL_LAGS = (24, 168)
+DEFAULT_WINDOWS = (24,)
+
+
+class IncrementalScaler:
+    """增量标准化器
+
+    逐块累积均值和方差（Chan等人的并行合并公式，统计量以float64保存），
+    再按块原地标准化float32缓冲区，适用于无法一次载入内存的数据。
+    属性命名与 sklearn 的 StandardScaler 保持一致。
+    """
+    
+    def __init__(self):
+        """初始化增量标准化器"""
+        self.n_samples_seen_ = 0
+        self.mean_ = None
+        self._m2 = None
+    
+    def partial_fit(self, X: Union[pd.DataFrame, np.ndarray]) -> "IncrementalScaler":
+        """
+        用一个数据块更新均值和方差
+        
+        Args:
+            X: 数据块
+            
+        Returns:
+            self
+        """
+        block = np.asarray(X, dtype=np.float64)
+        n_block = block.shape[0]
+        if n_block == 0:
+            return self
+        
+        block_mean = block.mean(axis=0)
+        block_m2 = ((block - block_mean) ** 2).sum(axis=0)
+        
+        if self.mean_ is None:
+            self.mean_ = block_mean
+            self._m2 = block_m2
+            self.n_samples_seen_ = n_block
+            return self
+        
+        n_seen = self.n_samples_seen_
+        n_total = n_seen + n_block
+        delta = block_mean - self.mean_
+        self.mean_ = self.mean_ + delta * (n_block / n_total)
+        self._m2 = self._m2 + block_m2 + delta ** 2 * (n_seen * n_block / n_total)
+        self.n_samples_seen_ = n_total
+        return self
+    
+    def fit(self, X: Union[pd.DataFrame, np.ndarray], chunk_size: int = 65536) -> "IncrementalScaler":
+        """
+        按行分块拟合整个数据集
+        
+        Args:
+            X: 特征数据
+            chunk_size: 每块行数
+            
+        Returns:
+            self
+        """
+        self.__init__()
+        for start in range(0, len(X), chunk_size):
+            self.partial_fit(X[start:start + chunk_size])
+        return self
+    
+    def fit_transform(self, X: Union[pd.DataFrame, np.ndarray], chunk_size: int = 65536) -> np.ndarray:
+        """
+        拟合后返回标准化的新数组（与 StandardScaler.fit_transform 的用法一致，
+        使 scale_features 在增量拟合之后仍可在同一预处理器上调用）
+        
+        Args:
+            X: 特征数据
+            chunk_size: 每块行数
+            
+        Returns:
+            标准化后的float32数组
+        """
+        return self.fit(X, chunk_size=chunk_size).transform(X)
+    
+    @property
+    def var_(self) -> np.ndarray:
+        """总体方差"""
+        self._check_fitted()
+        return self._m2 / self.n_samples_seen_
+    
+    @property
+    def scale_(self) -> np.ndarray:
+        """标准差，方差为0的特征按1处理（与StandardScaler一致）"""
+        scale = np.sqrt(self.var_)
+        scale[scale == 0.0] = 1.0
+        return scale
+    
+    def transform(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        返回标准化后的新数组（float32）
+        
+        Args:
+            X: 特征数据
+            
+        Returns:
+            标准化后的float32数组
+        """
+        out = np.array(X, dtype=np.float32)
+        return self.transform_inplace(out)
+    
+    def transform_inplace(self, X: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """
+        按块原地标准化浮点数组（可以是可写的内存映射数组）
+        
+        Args:
+            X: 浮点型特征数组
+            chunk_size: 每块行数
+            
+        Returns:
+            原地修改后的X
+        """
+        self._check_fitted()
+        if X.dtype.kind != 'f':
+            raise TypeError(f"原地标准化需要浮点数组，实际类型: {X.dtype}")
+        
+        mean = self.mean_.astype(X.dtype)
+        scale = self.scale_.astype(X.dtype)
+        for start in range(0, X.shape[0], chunk_size):
+            block = X[start:start + chunk_size]
+            block -= mean
+            block /= scale
+        return X
+    
+    def _check_fitted(self) -> None:
+        """检查是否已拟合"""
+        if self.mean_ is None:
+            raise ValueError("标准化器尚未拟合")
+
+
+class PreprocessingArtifact:
+    """可序列化的预处理产物
+
+    记录特征列顺序、原始列类型以及在训练集上拟合的标准化统计量，
+    推理时以一次融合的NumPy运算 (X - mean) * inv_scale 处理单行或批量数据，
+    无需构造pandas DataFrame。以小型JSON文件保存，加载只需几十微秒。
+    """
+    
+    def __init__(self, feature_columns: Sequence[str], dtypes: Mapping[str, str],
+                 mean: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None):
+        """
+        初始化预处理产物
+        
+        Args:
+            feature_columns: 特征列名（决定输入列顺序）
+            dtypes: 各特征列在训练数据中的类型
+            mean: 标准化均值，为None表示该模型不做标准化
+            scale: 标准化标准差
+        """
+        self.feature_columns = list(feature_columns)
+        self.dtypes = dict(dtypes)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+        self._inv_scale = None if scale is None else (1.0 / self.scale).astype(np.float32)
+    
+    @property
+    def scaled(self) -> bool:
+        """是否包含标准化步骤"""
+        return self.mean is not None
+    
+    def transform(self, X: Union[pd.DataFrame, np.ndarray, Mapping[str, float], Sequence[float]]) -> np.ndarray:
+        """
+        将单行或批量输入转换为模型所需的float32矩阵
+        
+        Args:
+            X: DataFrame（按列名取列）、列名到值的字典（单行）、一维或二维数组
+            
+        Returns:
+            形状为 (n_samples, n_features) 的float32数组
+        """
+        if isinstance(X, pd.DataFrame):
+            values = X[self.feature_columns].to_numpy()
+        elif isinstance(X, Mapping):
+            values = np.array([[X[col] for col in self.feature_columns]])
+        else:
+            values = np.asarray(X)
+            if values.ndim == 1:
+                values = values.reshape(1, -1)
+        
+        if values.shape[1] != len(self.feature_columns):
+            raise ValueError(f"特征数量不匹配: 期望 {len(self.feature_columns)}, 实际 {values.shape[1]}")
+        
+        out = np.empty(values.shape, dtype=np.float32)
+        if not self.scaled:
+            out[:] = values
+            return out
+        
+        np.subtract(values, self.mean, out=out, casting='unsafe')
+        out *= self._inv_scale
+        return out
+    
+    def save(self, path: str) -> None:
+        """
+        保存为JSON文件（float32统计量可无损往返）
+        
+        Args:
+            path: 保存路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        payload = {
+            'feature_columns': self.feature_columns,
+            'dtypes': self.dtypes,
+            'mean': None if self.mean is None else self.mean.astype(np.float64).tolist(),
+            'scale': None if self.scale is None else self.scale.astype(np.float64).tolist(),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        print(f"预处理产物已保存至: {path}")
+    
+    @classmethod
+    def load(cls, path: str) -> "PreprocessingArtifact":
+        """
+        从JSON文件加载
+        
+        Args:
+            path: 文件路径
+            
+        Returns:
+            预处理产物
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        return cls(payload['feature_columns'], payload['dtypes'],
+                   mean=payload['mean'], scale=payload['scale'])
+
+
+class LagFeatureState:
+    """滞后特征的增量状态
+
+    只保存最近 lookback 个时间步的目标变量（稠密时间轴上的尾部窗口，缺失为NaN）
+    和最后一个时间步。新数据到达时，把尾部窗口与新数据拼成一段局部时间轴计算特征，
+    代价只与新数据跨越的时间步数相关，与历史长度无关。结果与对全量历史调用
+    DataPreprocessor.add_lag_features 完全一致。
+    """
+    
+    def __init__(self, target: str = "cnt", lags: Sequence[int] = DEFAULT_LAGS,
+                 seasonal_lags: Sequence[int] = DEFAULT_SEASONAL_LAGS,
+                 windows: Sequence[int] = DEFAULT_WINDOWS):
+        """
+        初始化增量状态
+        
+        Args:
+            target: 目标变量列名
+            lags: 近期滞后步数
+            seasonal_lags: 季节性滞后步数
+            windows: 滚动窗口长度
+        """
+        self.target = target
+        self.lags = sorted(set(lags) | set(seasonal_lags))
+        self.windows = sorted(set(windows))
+        self.lookback = max([*self.lags, *self.windows, 1])
+        self.buffer = np.full(self.lookback, np.nan, dtype=np.float32)
+        self.last_step = None
+    
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, **kwargs) -> "LagFeatureState":
+        """
+        用历史数据的尾部初始化状态
+        
+        Args:
+            df: 历史数据（需包含 dteday/hr 和目标变量）
+            **kwargs: 传给构造函数的特征配置
+            
+        Returns:
+            增量状态
+        """
+        state = cls(**kwargs)
+        steps = _time_steps(df)
+        tail = df[steps > steps.max() - state.lookback]
+        state.update(tail)
+        return state
+    
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        为新到达的记录计算滞后特征并推进状态
+        
+        Args:
+            df: 新记录，时间必须晚于已处理的最后一个时间步
+            
+        Returns:
+            新增特征列后的新记录
+            
+        Raises:
+            ValueError: 如果新记录早于已处理的时间或存在重复时间点
+        """
+        if len(df) == 0:
+            empty = _lag_features_from_timeline(np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64),
+                                                self.target, self.lags, self.windows)
+            return df.assign(**empty)
+        
+        steps = _time_steps(df)
+        first, last = int(steps.min()), int(steps.max())
+        if self.last_step is not None and first <= self.last_step:
+            raise ValueError(f"新记录的时间步 {first} 不晚于已处理的最后时间步 {self.last_step}")
+        
+        # 与上次相隔超过 lookback 时，旧窗口已无用，直接从新数据开始
+        if self.last_step is None or first - self.last_step > self.lookback:
+            self.buffer[:] = np.nan
+            start = first
+        else:
+            start = self.last_step + 1
+        
+        timeline = np.concatenate([self.buffer, np.full(last - start + 1, np.nan, dtype=np.float32)])
+        positions = steps - start + self.lookback
+        if np.bincount(positions, minlength=len(timeline)).max() > 1:
+            raise ValueError("新记录中存在重复的时间点")
+        timeline[positions] = df[self.target].to_numpy(dtype=np.float32)
+        
+        features = _lag_features_from_timeline(timeline, positions, self.target, self.lags, self.windows)
+        
+        self.buffer = timeline[-self.lookback:].copy()
+        self.last_step = last
+        return df.assign(**features)
+    
+    def save(self, path: str) -> None:
+        """
+        保存状态（供每小时刷新任务跨进程复用）
+        
+        Args:
+            path: 保存路径（.npz）
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, target=np.array(self.target), lags=np.array(self.lags),
+                     windows=np.array(self.windows), buffer=self.buffer,
+                     last_step=np.array(-1 if self.last_step is None else self.last_step))
+    
+    @classmethod
+    def load(cls, path: str) -> "LagFeatureState":
+        """
+        加载状态
+        
+        Args:
+            path: 文件路径
+            
+        Returns:
+            增量状态
+        """
+        with np.load(path, allow_pickle=False) as data:
+            state = cls(target=str(data['target']), lags=data['lags'].tolist(),
+                        seasonal_lags=(), windows=data['windows'].tolist())
+            state.buffer = data['buffer'].astype(np.float32)
+            last_step = int(data['last_step'])
+        state.last_step = None if last_step < 0 else last_step
+        return state
+
+
 class DataPreprocessor:
     """数据预处理器类"""
     
@@ -16,43 +380,133 @@ class DataPreprocessor:
         """初始化预处理器"""
         self.scaler = StandardScaler()
         self.feature_columns = None
+        self.artifact = None
     
-    def prepare_features(self, df: pd.DataFrame, target: str = "cnt") -> Tuple[pd.DataFrame, pd.Series]:
+    def prepare_features(self, df: Union[pd.DataFrame, Iterable[pd.DataFrame]], target: str = "cnt",
+                         fit_scaler: bool = False, copy: bool = False) -> Tuple[pd.DataFrame, pd.Series]:
         """
         准备特征和目标变量
         
+        特征和目标通过列投影得到，不再对整个DataFrame做防御性复制；
+        在写时复制(Copy-on-Write)模式下返回的是原始数据的视图，修改它们不会影响原始数据。
+        
         Args:
-            df: 原始数据DataFrame
+            df: 原始数据DataFrame，或由 DataLoader.iter_hour_data 等产生的数据块流
             target: 目标变量列名
+            fit_scaler: 传入数据块流时，是否在遍历过程中增量拟合标准化器
+            copy: 是否返回与原始数据完全分离的副本
             
         Returns:
             (特征DataFrame, 目标变量Series)
         """
-        # 复制数据避免修改原始数据
-        data = df.copy()
+        if not isinstance(df, pd.DataFrame):
+            return self._prepare_features_stream(df, target, fit_scaler)
         
-        # 删除不需要的列
-        columns_to_drop = ['instant', 'dteday', 'casual', 'registered']
-        if target in columns_to_drop:
-            columns_to_drop.remove(target)
+        # 按列投影分离特征和目标，避免整表复制
+        self.feature_columns = self._select_feature_columns(df.columns, target)
+        X = df[self.feature_columns]
+        y = df[target]
         
-        # 确保目标列存在
-        if target not in data.columns:
-            raise ValueError(f"目标列 '{target}' 不存在于数据中")
+        if copy:
+            X = X.copy(deep=True)
+            y = y.copy(deep=True)
+        
+        self._print_feature_summary(y)
+        
+        return X, y
+    
+    def iter_features(self, chunks: Iterable[pd.DataFrame],
+                      target: str = "cnt") -> Iterator[Tuple[pd.DataFrame, pd.Series]]:
+        """
+        逐块提取特征和目标变量，每块只保留建模所需的列
+        
+        Args:
+            chunks: 原始数据块流
+            target: 目标变量列名
+            
+        Yields:
+            (特征块, 目标变量块)
+        """
+        for chunk in chunks:
+            if self.feature_columns is None:
+                self.feature_columns = self._select_feature_columns(chunk.columns, target)
+            yield chunk[self.feature_columns], chunk[target]
+    
+    def _prepare_features_stream(self, chunks: Iterable[pd.DataFrame], target: str,
+                                 fit_scaler: bool) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        从数据块流构建特征矩阵，原始数据块在投影后即被释放
+        
+        Args:
+            chunks: 原始数据块流
+            target: 目标变量列名
+            fit_scaler: 是否增量拟合标准化器
+            
+        Returns:
+            (特征DataFrame, 目标变量Series)
+        """
+        self.feature_columns = None
+        if fit_scaler:
+            self.scaler = IncrementalScaler()
+        X_parts, y_parts = [], []
+        for X_chunk, y_chunk in self.iter_features(chunks, target):
+            if fit_scaler:
+                self.scaler.partial_fit(X_chunk)
+            X_parts.append(X_chunk)
+            y_parts.append(y_chunk)
+        
+        if not X_parts:
+            raise ValueError("数据流为空，无法构建特征")
         
-        # 分离特征和目标
-        X = data.drop(columns=[col for col in columns_to_drop if col in data.columns])
-        X = X.drop(columns=[target])
-        y = data[target]
+        X = pd.concat(X_parts, ignore_index=True)
+        y = pd.concat(y_parts, ignore_index=True)
         
-        # 保存特征列名
-        self.feature_columns = X.columns.tolist()
+        self._print_feature_summary(y)
         
+        return X, y
+    
+    def _select_feature_columns(self, columns: Iterable[str], target: str) -> List[str]:
+        """
+        根据原始列名确定特征列
+        
+        Args:
+            columns: 原始数据列名
+            target: 目标变量列名
+            
+        Returns:
+            特征列名列表
+            
+        Raises:
+            ValueError: 如果目标列不存在
+        """
+        columns = list(columns)
+        if target not in columns:
+            raise ValueError(f"目标列 '{target}' 不存在于数据中")
+        
+        excluded = set(NON_FEATURE_COLUMNS) | {target}
+        return [col for col in columns if col not in excluded]
+    
+    def _print_feature_summary(self, y: pd.Series) -> None:
+        """打印特征列表和目标变量统计"""
         print(f"特征数量: {len(self.feature_columns)}")
         print(f"特征列表: {self.feature_columns}")
         print(f"目标变量统计: 均值={y.mean():.2f}, 标准差={y.std():.2f}, 最小值={y.min()}, 最大值={y.max()}")
+    
+    def transform_features(self, X: pd.DataFrame) -> pd.DataFrame:
+        """
+        使用已拟合的标准化器转换特征（不重新拟合）
         
-        return X, y
+        Args:
+            X: 特征数据
+            
+        Returns:
+            标准化后的特征
+        """
+        return pd.DataFrame(
+            self.scaler.transform(X),
+            columns=X.columns,
+            index=X.index
+        )
     
     def scale_features(self, X_train: pd.DataFrame, X_test: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
         """
@@ -81,6 +535,113 @@ class DataPreprocessor:
         
         return X_train_scaled, None
     
+    def scale_features_inplace(self, X: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """
+        增量标准化：分块累积统计量后分块原地转换，不构造第二份特征矩阵
+        
+        Args:
+            X: float32特征数组，可以是以可写方式打开的特征库内存映射
+            chunk_size: 每块行数
+            
+        Returns:
+            原地标准化后的X
+        """
+        self.scaler = IncrementalScaler().fit(X, chunk_size=chunk_size)
+        return self.scaler.transform_inplace(X, chunk_size=chunk_size)
+    
+    def fit_artifact(self, X_train: Union[pd.DataFrame, np.ndarray], scale: bool = True) -> PreprocessingArtifact:
+        """
+        仅在训练集上拟合并生成可序列化的预处理产物
+        
+        Args:
+            X_train: 训练集特征
+            scale: 是否包含标准化步骤（树模型不需要）
+            
+        Returns:
+            预处理产物（同时保存在 self.artifact）
+        """
+        if isinstance(X_train, pd.DataFrame):
+            feature_columns = X_train.columns.tolist()
+            dtypes: Dict[str, str] = {col: str(dtype) for col, dtype in X_train.dtypes.items()}
+        else:
+            feature_columns = self.feature_columns or [f"f{i}" for i in range(X_train.shape[1])]
+            dtypes = {col: str(X_train.dtype) for col in feature_columns}
+        
+        if scale:
+            scaler = IncrementalScaler().fit(X_train)
+            self.artifact = PreprocessingArtifact(feature_columns, dtypes,
+                                                  mean=scaler.mean_, scale=scaler.scale_)
+        else:
+            self.artifact = PreprocessingArtifact(feature_columns, dtypes)
+        return self.artifact
+    
+    def add_lag_features(self, df: pd.DataFrame, target: str = "cnt",
+                         lags: Sequence[int] = DEFAULT_LAGS,
+                         seasonal_lags: Sequence[int] = DEFAULT_SEASONAL_LAGS,
+                         windows: Sequence[int] = DEFAULT_WINDOWS,
+                         group_column: Optional[str] = None) -> pd.DataFrame:
+        """
+        添加滞后、滚动窗口和季节性滞后特征
+        
+        按 dteday/hr 计算绝对时间步，把目标变量散布到一条稠密时间轴上，
+        缺失的小时在时间轴上为NaN，因此滞后k步总是取真实的 t-k 时刻而不是前k行。
+        全部运算为向量化的数组索引和pandas滚动窗口，复杂度与行数和时间跨度线性相关。
+        
+        Args:
+            df: 原始数据（需包含 dteday，小时数据还需包含 hr）
+            target: 目标变量列名
+            lags: 近期滞后步数，如前1/2/3小时
+            seasonal_lags: 季节性滞后步数，如昨天同一小时(24)、上周同一小时(168)
+            windows: 滚动窗口长度，统计 t 之前（不含 t）窗口内的均值和最大值
+            group_column: 分组列（如站点），各组的时间轴互不干扰
+            
+        Returns:
+            新增特征列后的DataFrame；历史不足的位置为NaN
+        """
+        if target not in df.columns:
+            raise ValueError(f"目标列 '{target}' 不存在于数据中")
+        
+        steps = _time_steps(df)
+        lookback = max([*lags, *seasonal_lags, *windows, 0])
+        
+        # 每组占据一段 [组号*跨度, 组号*跨度+时间范围] 的时间轴，组间留出 lookback 的空白
+        steps = steps - steps.min()
+        if group_column is not None:
+            codes, _ = pd.factorize(df[group_column])
+            positions = codes.astype(np.int64) * (int(steps.max()) + lookback + 1) + steps
+        else:
+            positions = steps
+        
+        size = int(positions.max()) + 1
+        if np.bincount(positions, minlength=size).max() > 1:
+            raise ValueError("存在重复的时间点，无法计算滞后特征（多站点数据请指定 group_column）")
+        
+        timeline = np.full(size, np.nan, dtype=np.float32)
+        timeline[positions] = df[target].to_numpy(dtype=np.float32)
+        
+        features = _lag_features_from_timeline(timeline, positions, target,
+                                               sorted(set(lags) | set(seasonal_lags)), sorted(set(windows)))
+        
+        print(f"新增时序特征: {list(features)}")
+        return df.assign(**features)
+    
+    def prepare_incremental(self, df: pd.DataFrame, state: LagFeatureState,
+                            target: str = "cnt") -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        只为新到达的记录生成特征行，滞后特征由增量状态提供
+        
+        Args:
+            df: 新记录
+            state: 增量状态（会被推进）
+            target: 目标变量列名
+            
+        Returns:
+            (新记录的特征DataFrame, 目标变量Series)
+        """
+        data = state.update(df)
+        feature_columns = self.feature_columns or self._select_feature_columns(data.columns, target)
+        return data[feature_columns], data[target]
+    
     def get_feature_importance_data(self, feature_importance: np.ndarray) -> pd.DataFrame:
         """
         获取特征重要性数据框（用于可视化）
@@ -101,3 +662,49 @@ class DataPreprocessor:
         
         return importance_df
 
+
+def _lag_features_from_timeline(timeline: np.ndarray, positions: np.ndarray, target: str,
+                                lags: Sequence[int], windows: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    在稠密时间轴上按位置收集滞后和滚动窗口特征
+    
+    Args:
+        timeline: 稠密时间轴上的目标变量（缺失为NaN）
+        positions: 各行在时间轴上的位置
+        target: 目标变量列名（用于特征命名）
+        lags: 滞后步数
+        windows: 滚动窗口长度
+        
+    Returns:
+        特征名到float32数组的字典
+    """
+    features = {}
+    for lag in lags:
+        source = positions - lag
+        valid = source >= 0
+        column = np.full(len(positions), np.nan, dtype=np.float32)
+        column[valid] = timeline[source[valid]]
+        features[f"{target}_lag_{lag}"] = column
+    
+    history = pd.Series(timeline).shift(1)
+    for window in windows:
+        rolling = history.rolling(window, min_periods=1)
+        features[f"{target}_roll_mean_{window}"] = rolling.mean().to_numpy(dtype=np.float32)[positions]
+        features[f"{target}_roll_max_{window}"] = rolling.max().to_numpy(dtype=np.float32)[positions]
+    return features
+
+
+def _time_steps(df: pd.DataFrame) -> np.ndarray:
+    """
+    计算每行的绝对时间步（小时数据为小时，每日数据为天）
+    
+    Args:
+        df: 包含 dteday（及 hr）的数据
+        
+    Returns:
+        int64 时间步数组
+    """
+    dates = pd.to_datetime(df['dteday']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    if 'hr' in df.columns:
+        return dates * 24 + df['hr'].to_numpy(dtype=np.int64)
+    return dates
@@ -0,0 +1,189 @@
+"""
+特征库模块
+将预处理后的特征矩阵和目标变量以float32写入内存映射文件，
+供训练与分析脚本零拷贝打开，多个进程可共享同一份页缓存
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+class FeatureStore:
+    """内存映射特征库类
+
+    目录结构:
+        X.npy      float32 特征矩阵，行优先 (n_samples, n_features)
+        y.npy      float32 目标变量 (n_samples,)
+        meta.json  特征列名、来源文件指纹、预处理配置等元数据（最后写入，作为完整性标志）
+    """
+    
+    X_FILE = "X.npy"
+    Y_FILE = "y.npy"
+    META_FILE = "meta.json"
+    
+    def __init__(self, store_dir: str = "output/feature_store"):
+        """
+        初始化特征库
+        
+        Args:
+            store_dir: 特征库目录
+        """
+        self.store_dir = store_dir
+    
+    def save(self, X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray],
+             feature_columns: Optional[List[str]] = None,
+             source_path: Optional[str] = None,
+             config: Optional[Dict[str, Any]] = None) -> None:
+        """
+        将特征矩阵和目标变量写入特征库
+        
+        DataFrame 按列逐一写入内存映射文件，不会在内存中额外构造完整的float32副本。
+        
+        Args:
+            X: 特征数据
+            y: 目标变量
+            feature_columns: 特征列名（X为DataFrame时默认取其列名）
+            source_path: 原始数据文件路径，用于判断特征库是否过期
+            config: 生成特征所用的预处理配置（可JSON序列化），用于判断特征库是否过期
+        """
+        if feature_columns is None:
+            if isinstance(X, pd.DataFrame):
+                feature_columns = X.columns.tolist()
+            else:
+                feature_columns = [f"f{i}" for i in range(X.shape[1])]
+        
+        n_samples, n_features = X.shape
+        if len(y) != n_samples:
+            raise ValueError(f"特征行数({n_samples})与目标变量长度({len(y)})不一致")
+        
+        os.makedirs(self.store_dir, exist_ok=True)
+        meta_path = os.path.join(self.store_dir, self.META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        
+        X_tmp = self._path(self.X_FILE) + ".tmp"
+        X_map = np.lib.format.open_memmap(X_tmp, mode="w+", dtype=np.float32,
+                                          shape=(n_samples, n_features))
+        if isinstance(X, pd.DataFrame):
+            for j, col in enumerate(X.columns):
+                X_map[:, j] = X[col].to_numpy()
+        else:
+            X_map[:] = X
+        X_map.flush()
+        del X_map
+        os.replace(X_tmp, self._path(self.X_FILE))
+        
+        y_tmp = self._path(self.Y_FILE) + ".tmp"
+        with open(y_tmp, "wb") as f:
+            np.save(f, np.asarray(y, dtype=np.float32))
+        os.replace(y_tmp, self._path(self.Y_FILE))
+        
+        meta = {
+            'n_samples': n_samples,
+            'feature_columns': list(feature_columns),
+            'source': _source_fingerprint(source_path) if source_path else None,
+            'config': _normalize_config(config),
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        
+        size_mb = (n_samples * n_features + n_samples) * 4 / 1024 ** 2
+        print(f"特征库已写入: {self.store_dir} ({n_samples} 行 x {n_features} 列, {size_mb:.2f} MB)")
+    
+    def load(self, mmap: bool = True, writable: bool = False) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        打开特征库
+        
+        Args:
+            mmap: 是否以内存映射方式打开（零拷贝）
+            writable: 内存映射是否可写（用于原地标准化等操作）
+            
+        Returns:
+            (特征矩阵, 目标变量, 特征列名)
+            
+        Raises:
+            FileNotFoundError: 如果特征库不存在或不完整
+        """
+        meta = self._read_meta()
+        if meta is None:
+            raise FileNotFoundError(f"特征库不存在或不完整: {self.store_dir}")
+        
+        mmap_mode = None
+        if mmap:
+            mmap_mode = "r+" if writable else "r"
+        X = np.load(self._path(self.X_FILE), mmap_mode=mmap_mode)
+        y = np.load(self._path(self.Y_FILE), mmap_mode=mmap_mode)
+        return X, y, meta['feature_columns']
+    
+    def is_fresh(self, source_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        判断特征库是否存在，且与原始数据文件和预处理配置一致
+        
+        Args:
+            source_path: 原始数据文件路径，为None时不检查原始数据
+            config: 预处理配置，须与写入时的配置相同（写入时未提供配置则此处也应为None）
+            
+        Returns:
+            特征库是否可用
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return False
+        if meta.get('config') != _normalize_config(config):
+            return False
+        if source_path is None:
+            return True
+        if not os.path.exists(source_path):
+            return False
+        return meta.get('source') == _source_fingerprint(source_path)
+    
+    def _path(self, file_name: str) -> str:
+        """获取特征库内文件路径"""
+        return os.path.join(self.store_dir, file_name)
+    
+    def _read_meta(self) -> Optional[Dict]:
+        """读取元数据，不存在或损坏时返回None"""
+        try:
+            with open(self._path(self.META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def _source_fingerprint(source_path: str) -> Dict:
+    """原始数据文件指纹（路径、大小、修改时间）"""
+    stat = os.stat(source_path)
+    return {
+        'path': os.path.abspath(source_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+def _normalize_config(config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """把预处理配置转换为JSON往返后的形式（元组变为列表），保证与元数据中的记录可直接比较"""
+    if config is None:
+        return None
+    return json.loads(json.dumps(config, sort_keys=True))
+
+
+def write_shared_array(directory: str, name: str, data: Union[pd.DataFrame, pd.Series, np.ndarray]) -> str:
+    """
+    将数组以float32写入 .npy 文件，供工作进程以内存映射方式共享
+    
+    Args:
+        directory: 目录
+        name: 文件名（不含扩展名）
+        data: 数据
+        
+    Returns:
+        文件路径
+    """
+    path = os.path.join(directory, f"{name}.npy")
+    array = data.to_numpy() if isinstance(data, (pd.DataFrame, pd.Series)) else data
+    np.save(path, np.ascontiguousarray(array, dtype=np.float32))
+    return path
@@ -0,0 +1,154 @@
+"""
+多步预测模块
+给定起始时刻和天气预报序列，向量化生成日历特征，一次批量预测未来24/168小时；
+模型使用滞后特征时按滞后步长分块递归，把已预测的值写回时间轴供后续步使用
+"""
+
+from typing import Callable, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import AbstractHolidayCalendar, Holiday, USFederalHolidayCalendar, nearest_workday
+
+from .data_preprocessor import LagFeatureState, _lag_features_from_timeline, _time_steps
+
+
+WEATHER_COLUMNS = ['weathersit', 'temp', 'atemp', 'hum', 'windspeed']
+BASE_YEAR = 2011
+
+# 季节从每年的这些日期开始（与数据集一致：1冬 2春 3夏 4秋）
+SEASON_STARTS = ((3, 21, 2), (6, 21, 3), (9, 23, 4), (12, 21, 1))
+
+
+class WashingtonHolidayCalendar(AbstractHolidayCalendar):
+    """数据集所用的节假日：美国联邦节假日 + 华盛顿特区解放日"""
+    rules = USFederalHolidayCalendar.rules + [
+        Holiday("DC Emancipation Day", month=4, day=16, observance=nearest_workday),
+    ]
+
+
+class Forecaster:
+    """多步预测器类"""
+
+    def __init__(self, predict: Callable[[pd.DataFrame], np.ndarray], feature_columns: Sequence[str],
+                 lag_state: Optional[LagFeatureState] = None):
+        """
+        初始化多步预测器
+
+        Args:
+            predict: 预测函数，输入为按 feature_columns 排列的DataFrame
+            feature_columns: 模型的特征列
+            lag_state: 截至预测起点的滞后特征状态（模型使用滞后特征时必需，不会被修改）
+        """
+        self.predict = predict
+        self.feature_columns = list(feature_columns)
+        self.lag_state = lag_state
+
+        self.uses_lags = lag_state is not None and any(
+            col.startswith(f"{lag_state.target}_") for col in self.feature_columns
+        )
+        if lag_state is None and any('_lag_' in col or '_roll_' in col for col in self.feature_columns):
+            raise ValueError("模型使用了滞后特征，需要提供 lag_state")
+
+    def calendar_features(self, start: Union[str, pd.Timestamp], horizon: int) -> pd.DataFrame:
+        """
+        向量化生成从 start 起每小时的日历特征
+
+        Args:
+            start: 起始时刻（取整到小时）
+            horizon: 小时数
+
+        Returns:
+            包含 dteday、hr、season、yr、mnth、holiday、weekday、workingday 的DataFrame
+        """
+        times = pd.date_range(pd.Timestamp(start).floor("h"), periods=horizon, freq="h")
+        days = times.normalize()
+        month, day = times.month.to_numpy(), times.day.to_numpy()
+
+        season = np.ones(horizon, dtype=np.int8)
+        for start_month, start_day, value in SEASON_STARTS[:-1]:
+            season[(month > start_month) | ((month == start_month) & (day >= start_day))] = value
+        last_month, last_day, last_value = SEASON_STARTS[-1]
+        season[(month == last_month) & (day >= last_day)] = last_value
+
+        holidays = WashingtonHolidayCalendar().holidays(days.min(), days.max())
+        holiday = days.isin(holidays).astype(np.int8)
+        weekday = ((times.dayofweek.to_numpy() + 1) % 7).astype(np.int8)
+        workingday = ((weekday >= 1) & (weekday <= 5) & (holiday == 0)).astype(np.int8)
+
+        return pd.DataFrame({
+            'dteday': days,
+            'hr': times.hour.to_numpy().astype(np.int8),
+            'season': season,
+            'yr': (times.year.to_numpy() - BASE_YEAR).astype(np.int8),
+            'mnth': month.astype(np.int8),
+            'holiday': holiday,
+            'weekday': weekday,
+            'workingday': workingday,
+        }, index=times)
+
+    def forecast(self, start: Union[str, pd.Timestamp], weather: pd.DataFrame,
+                 horizon: Optional[int] = None) -> pd.Series:
+        """
+        预测从 start 起未来 horizon 小时
+
+        不使用滞后特征时所有时刻一次批量预测；使用滞后特征时每次预测
+        min(最小滞后, 1 若有滚动窗口) 个时刻，预测值写回时间轴后再计算下一块的特征。
+
+        Args:
+            start: 起始时刻
+            weather: 天气预报（weathersit、temp、atemp、hum、windspeed 列，按小时排列）
+            horizon: 预测小时数，默认为天气预报的长度
+
+        Returns:
+            以时刻为索引的预测值Series
+        """
+        if horizon is None:
+            horizon = len(weather)
+        if horizon < 1:
+            raise ValueError(f"预测步数必须为正整数，收到 {horizon}")
+        if len(weather) < horizon:
+            raise ValueError(f"天气预报只有 {len(weather)} 小时，少于预测步数 {horizon}")
+        missing = [col for col in WEATHER_COLUMNS if col not in weather.columns]
+        if missing:
+            raise ValueError(f"天气预报缺少列: {missing}")
+
+        frame = self.calendar_features(start, horizon)
+        for col in WEATHER_COLUMNS:
+            frame[col] = weather[col].to_numpy()[:horizon]
+
+        if not self.uses_lags:
+            predictions = self.predict(frame[self.feature_columns])
+        else:
+            predictions = self._forecast_recursive(frame)
+        return pd.Series(np.asarray(predictions, dtype=np.float64), index=frame.index, name='prediction')
+
+    def _forecast_recursive(self, frame: pd.DataFrame) -> np.ndarray:
+        """
+        分块递归预测：在状态尾部窗口之后展开时间轴，逐块填入预测值
+
+        预测起点必须紧接滞后状态的最后时间步：中间缺失的小时没有观测值也没有预测值，
+        滞后特征会变成NaN，因此先用 LagFeatureState.update 补齐观测再预测。
+        """
+        state = self.lag_state
+        steps = _time_steps(frame)
+        if state.last_step is not None and steps[0] != state.last_step + 1:
+            raise ValueError(f"预测起点（时间步 {steps[0]}）必须紧接滞后状态的最后时间步 {state.last_step}，"
+                             f"请先用 update() 补齐其间 {steps[0] - state.last_step - 1} 小时的观测值")
+
+        timeline = np.concatenate([state.buffer, np.full(len(frame), np.nan, dtype=np.float32)])
+        positions = state.lookback + np.arange(len(frame))
+
+        block = min(state.lags) if state.lags else len(frame)
+        if state.windows:
+            block = 1
+
+        predictions = np.empty(len(frame), dtype=np.float64)
+        for begin in range(0, len(frame), block):
+            rows = slice(begin, begin + block)
+            features = _lag_features_from_timeline(timeline, positions[rows], state.target,
+                                                   state.lags, state.windows)
+            X = frame.iloc[rows].assign(**features)[self.feature_columns]
+            predictions[rows] = self.predict(X)
+            timeline[positions[rows]] = predictions[rows]
+        return predictions
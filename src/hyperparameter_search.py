@@ -0,0 +1,376 @@
+"""
+超参数搜索模块
+以连续减半(Successive Halving)/Hyperband 在有限的墙钟时间内搜索模型超参数：
+先用少量树和少量样本评估大量候选，逐轮淘汰，只把最好的候选提升到更大的资源上。
+每个试验的结果追加写入日志文件，中断后以相同数据和搜索配置重新运行会跳过已完成的试验。
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .feature_store import write_shared_array
+from .model_registry import ModelSpec
+
+
+# 各估计器的默认搜索空间（参数名 → 候选值列表）
+DEFAULT_SEARCH_SPACES: Dict[str, Dict[str, List[Any]]] = {
+    'random_forest': {
+        'n_estimators': [100, 200, 500, 1000],
+        'max_depth': [6, 8, 10, 12, 16, None],
+        'min_samples_leaf': [1, 2, 5],
+        'max_features': [1.0, 0.7, 0.5],
+    },
+    'hist_gradient_boosting': {
+        'max_iter': [200, 500, 1000],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_leaf_nodes': [15, 31, 63, 127],
+        'min_samples_leaf': [10, 20, 50],
+        'l2_regularization': [0.0, 0.1, 1.0],
+    },
+}
+
+# 随资源比例缩放的“轮数”类参数（树的数量、迭代次数）
+ITERATION_PARAMS = ('n_estimators', 'max_iter')
+
+
+class SuccessiveHalvingSearch:
+    """连续减半 / Hyperband 超参数搜索类
+
+    资源为训练样本比例：第 k 轮使用 min_resource * eta^k 比例的训练样本，
+    n_estimators/max_iter 也按同一比例缩小（不少于 min_iterations），
+    每轮保留验证集RMSE最好的 1/eta 个候选。验证集为训练数据按时间顺序的最后一段。
+    """
+    
+    def __init__(self, spec: ModelSpec, param_space: Optional[Dict[str, List[Any]]] = None,
+                 n_candidates: int = 27, eta: int = 3, min_resource: float = 1 / 9,
+                 hyperband: bool = False, time_budget: Optional[float] = None,
+                 n_workers: Optional[int] = None, log_path: Optional[str] = None,
+                 validation_fraction: float = 0.2, min_iterations: int = 10,
+                 random_state: int = 42):
+        """
+        初始化搜索
+        
+        Args:
+            spec: 要调参的模型声明（搜索到的参数覆盖其 params）
+            param_space: 搜索空间，默认取 DEFAULT_SEARCH_SPACES 中对应估计器的空间
+            n_candidates: 连续减半首轮的候选数量（Hyperband模式下由各分组自动确定）
+            eta: 每轮的淘汰倍数
+            min_resource: 首轮使用的训练样本比例
+            hyperband: 是否使用 Hyperband（多组不同起始资源的连续减半）
+            time_budget: 墙钟时间预算（秒），用尽后不再启动新试验并返回当前最优（已开始的试验会运行完毕）
+            n_workers: 并行试验的进程数
+            log_path: 试验日志路径（JSON Lines），存在时从中恢复
+            validation_fraction: 验证集比例
+            min_iterations: 缩放后树数量/迭代次数的下限
+            random_state: 随机种子（决定候选采样和子样本）
+        """
+        self.spec = spec
+        self.param_space = param_space or DEFAULT_SEARCH_SPACES.get(spec.estimator)
+        if not self.param_space:
+            raise ValueError(f"估计器 '{spec.estimator}' 没有默认搜索空间，请指定 param_space")
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_resource = min_resource
+        self.hyperband = hyperband
+        self.time_budget = time_budget
+        self.n_workers = n_workers or (os.cpu_count() or 1)
+        self.log_path = log_path
+        self.validation_fraction = validation_fraction
+        self.min_iterations = min_iterations
+        self.random_state = random_state
+        self.trials: Dict[str, Dict] = {}
+        self._data_signature = ''
+        self._config_hash = ''
+        self._feature_names: Optional[List[str]] = None
+    
+    def run(self, X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray],
+            feature_names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        执行搜索
+        
+        Args:
+            X: 特征数据（按时间顺序排列）
+            y: 目标变量
+            feature_names: 特征列名（用于类别特征掩码，X为DataFrame时默认取其列名）
+            
+        Returns:
+            包含最优参数、最优验证RMSE、全部试验记录、状态和耗时的字典
+        """
+        if feature_names is None and isinstance(X, pd.DataFrame):
+            feature_names = X.columns.tolist()
+        self._feature_names = list(feature_names) if feature_names is not None else None
+        self._data_signature = _data_signature(X, y)
+        self._config_hash = self._search_config_hash()
+        self.trials = self._load_log()
+        if self.trials:
+            print(f"从试验日志恢复 {len(self.trials)} 条已完成的试验: {self.log_path}")
+        
+        start = time.perf_counter()
+        status = 'completed'
+        with tempfile.TemporaryDirectory(prefix="bike_search_") as tmp_dir:
+            paths = self._share_data(X, y, tmp_dir)
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                for bracket, (n_candidates, min_resource) in enumerate(self._brackets()):
+                    candidates = self._sample_candidates(n_candidates, bracket)
+                    if not self._successive_halving(executor, paths, candidates, min_resource, bracket, start):
+                        status = 'budget_exhausted'
+                        break
+        
+        elapsed = time.perf_counter() - start
+        best = self._best_trial()
+        if best is None:
+            raise RuntimeError("时间预算内没有完成任何试验")
+        
+        print(f"\n搜索{'完成' if status == 'completed' else '因时间预算停止'}: "
+              f"{len(self.trials)} 个试验, 耗时 {elapsed:.1f} s")
+        print(f"最优参数 (样本比例 {best['resource']:.2f}): {best['params']}, 验证集 RMSE = {best['rmse']:.3f}")
+        
+        return {
+            'best_params': best['params'],
+            'best_rmse': best['rmse'],
+            'trials': list(self.trials.values()),
+            'status': status,
+            'elapsed': elapsed,
+        }
+    
+    def _brackets(self) -> List[Tuple[int, float]]:
+        """
+        生成 (首轮候选数, 首轮资源比例) 列表
+        
+        连续减半只有一组；Hyperband 按 s = s_max..0 生成多组，s 越大候选越多、起始资源越小。
+        """
+        if not self.hyperband:
+            return [(self.n_candidates, self.min_resource)]
+        
+        s_max = int(math.floor(math.log(1 / self.min_resource, self.eta) + 1e-9))
+        return [
+            (int(math.ceil((s_max + 1) / (s + 1) * self.eta ** s)), self.eta ** -s)
+            for s in range(s_max, -1, -1)
+        ]
+    
+    def _sample_candidates(self, n: int, bracket: int) -> List[Dict[str, Any]]:
+        """按固定种子从搜索空间中采样不重复的候选（恢复时得到相同的候选）"""
+        rng = np.random.default_rng(self.random_state + bracket)
+        names = sorted(self.param_space)
+        total = math.prod(len(self.param_space[name]) for name in names)
+        candidates, seen = [], set()
+        while len(candidates) < min(n, total):
+            params = {name: self.param_space[name][rng.integers(len(self.param_space[name]))] for name in names}
+            key = json.dumps(params, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                candidates.append(params)
+        return candidates
+    
+    def _successive_halving(self, executor: ProcessPoolExecutor, paths: Dict[str, str],
+                            candidates: List[Dict[str, Any]], min_resource: float,
+                            bracket: int, start: float) -> bool:
+        """
+        执行一组连续减半
+        
+        Returns:
+            是否在时间预算内完成
+        """
+        resource = min_resource
+        rung = 0
+        while candidates:
+            resource = min(resource, 1.0)
+            print(f"\n[分组 {bracket} 第 {rung} 轮] {len(candidates)} 个候选, 样本比例 {resource:.3f}")
+            scored = self._run_rung(executor, paths, candidates, resource, bracket, rung, start)
+            if scored is None:
+                return False
+            if resource >= 1.0 or len(candidates) == 1:
+                return True
+            
+            scored.sort(key=lambda trial: trial['rmse'])
+            keep = max(1, len(candidates) // self.eta)
+            candidates = [trial['params'] for trial in scored[:keep]]
+            resource *= self.eta
+            rung += 1
+        return True
+    
+    def _run_rung(self, executor: ProcessPoolExecutor, paths: Dict[str, str],
+                  candidates: List[Dict[str, Any]], resource: float,
+                  bracket: int, rung: int, start: float) -> Optional[List[Dict]]:
+        """
+        并行评估一轮候选，已记录在日志中的试验直接复用
+        
+        Returns:
+            本轮全部试验记录；时间预算用尽时返回None
+        """
+        scored, pending = [], {}
+        for params in candidates:
+            spec_dict = self._trial_spec(params, resource).to_dict()
+            key = _trial_key(spec_dict, resource, self._data_signature, self._config_hash)
+            if key in self.trials:
+                # 缩放轮数后不同候选可能得到相同的试验声明，复用记录时保留本候选的参数
+                scored.append({**self.trials[key], 'params': params})
+                continue
+            task = (spec_dict, self.random_state, self._feature_names, paths, resource)
+            pending[executor.submit(_trial_worker, task)] = (key, params)
+        
+        while pending:
+            remaining = None
+            if self.time_budget is not None:
+                remaining = self.time_budget - (time.perf_counter() - start)
+                if remaining <= 0:
+                    for future in pending:
+                        future.cancel()
+                    return None
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, params = pending.pop(future)
+                rmse, fit_time = future.result()
+                trial = {
+                    'key': key, 'bracket': bracket, 'rung': rung, 'params': params,
+                    'resource': resource, 'rmse': rmse, 'fit_time': fit_time,
+                    'data': self._data_signature, 'config': self._config_hash,
+                }
+                self.trials[key] = trial
+                self._append_log(trial)
+                scored.append(trial)
+                print(f"  RMSE={rmse:8.3f}  耗时 {fit_time:6.2f} s  {params}")
+        return scored
+    
+    def _trial_spec(self, params: Dict[str, Any], resource: float) -> ModelSpec:
+        """构造按资源比例缩放轮数后的试验模型声明"""
+        trial_params = {**self.spec.params, **params}
+        for name in ITERATION_PARAMS:
+            if name in trial_params:
+                trial_params[name] = max(self.min_iterations, int(round(trial_params[name] * resource)))
+        spec_dict = self.spec.to_dict()
+        spec_dict['params'] = trial_params
+        return ModelSpec(**spec_dict)
+    
+    def _share_data(self, X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray],
+                    tmp_dir: str) -> Dict[str, str]:
+        """
+        切分出时间上最后一段作为验证集，训练部分按固定种子打乱后写入共享文件，
+        使任意比例的子样本都是文件前缀（工作进程以内存映射切片读取，不复制）
+        """
+        X_values = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+        y_values = y.to_numpy() if isinstance(y, pd.Series) else np.asarray(y)
+        n_train = int(len(X_values) * (1 - self.validation_fraction))
+        permutation = np.random.default_rng(self.random_state).permutation(n_train)
+        return {
+            'X_train': write_shared_array(tmp_dir, 'X_train', X_values[:n_train][permutation]),
+            'y_train': write_shared_array(tmp_dir, 'y_train', y_values[:n_train][permutation]),
+            'X_val': write_shared_array(tmp_dir, 'X_val', X_values[n_train:]),
+            'y_val': write_shared_array(tmp_dir, 'y_val', y_values[n_train:]),
+        }
+    
+    def _best_trial(self) -> Optional[Dict]:
+        """在使用最大资源的试验中取验证RMSE最小者"""
+        if not self.trials:
+            return None
+        max_resource = max(trial['resource'] for trial in self.trials.values())
+        finalists = [trial for trial in self.trials.values() if trial['resource'] == max_resource]
+        return min(finalists, key=lambda trial: trial['rmse'])
+    
+    def _search_config_hash(self) -> str:
+        """
+        影响试验结果的搜索配置的哈希：模型声明、搜索空间、验证集比例、轮数下限、随机种子和特征列
+        
+        eta、候选数量、Hyperband 等只决定运行哪些试验，不改变单个试验的结果，因此不计入。
+        """
+        payload = json.dumps({
+            'spec': self.spec.to_dict(),
+            'param_space': self.param_space,
+            'validation_fraction': self.validation_fraction,
+            'min_iterations': self.min_iterations,
+            'random_state': self.random_state,
+            'feature_names': self._feature_names,
+        }, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    
+    def _load_log(self) -> Dict[str, Dict]:
+        """读取试验日志中数据指纹和搜索配置都与本次相同的记录（忽略写了一半的最后一行）"""
+        trials = {}
+        if not self.log_path or not os.path.exists(self.log_path):
+            return trials
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    trial = json.loads(line)
+                except ValueError:
+                    continue
+                if trial.get('data') != self._data_signature or trial.get('config') != self._config_hash:
+                    continue
+                trials[trial['key']] = trial
+        return trials
+    
+    def _append_log(self, trial: Dict) -> None:
+        """追加一条试验记录并立即落盘"""
+        if not self.log_path:
+            return
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(trial, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _data_signature(X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray]) -> str:
+    """数据指纹：形状加上等间隔抽样行的哈希，数据变化时旧日志中的试验不会被复用"""
+    X_values = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+    y_values = y.to_numpy() if isinstance(y, pd.Series) else np.asarray(y)
+    step = max(1, len(X_values) // 1000)
+    digest = hashlib.sha1(str(X_values.shape).encode("utf-8"))
+    digest.update(np.ascontiguousarray(X_values[::step], dtype=np.float32).tobytes())
+    digest.update(np.ascontiguousarray(y_values[::step], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def _trial_key(spec_dict: Dict[str, Any], resource: float, data_signature: str, config_hash: str) -> str:
+    """试验的唯一标识：试验模型声明（合并基础参数并缩放轮数后的完整参数）、资源比例、数据指纹和搜索配置的哈希"""
+    payload = json.dumps({'spec': spec_dict, 'resource': round(resource, 6), 'data': data_signature,
+                          'config': config_hash}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _trial_worker(task: Tuple) -> Tuple[float, float]:
+    """
+    试验工作进程入口：在训练子样本上训练，在验证集上评估
+    
+    Args:
+        task: (模型声明字典, 随机种子, 特征列名, 共享数据路径, 样本比例)
+        
+    Returns:
+        (验证集RMSE, 训练耗时秒数)
+    """
+    from threadpoolctl import threadpool_limits
+    
+    spec_dict, random_state, feature_names, paths, resource = task
+    spec = ModelSpec(**spec_dict)
+    X_train = np.load(paths['X_train'], mmap_mode='r')
+    y_train = np.load(paths['y_train'], mmap_mode='r')
+    X_val = np.load(paths['X_val'], mmap_mode='r')
+    y_val = np.load(paths['y_val'], mmap_mode='r')
+    
+    n_rows = max(1, int(len(X_train) * resource))
+    X_train, y_train = X_train[:n_rows], y_train[:n_rows]
+    if spec.scale:
+        from .data_preprocessor import DataPreprocessor
+        artifact = DataPreprocessor().fit_artifact(X_train, scale=True)
+        X_train, X_val = artifact.transform(X_train), artifact.transform(X_val)
+    
+    start = time.perf_counter()
+    with threadpool_limits(limits=1):
+        model = spec.build(random_state, feature_names, n_jobs=1)
+        model.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+    
+    y_pred = model.predict(X_val)
+    rmse = float(np.sqrt(np.mean((np.asarray(y_val, dtype=np.float64) - y_pred) ** 2)))
+    return rmse, fit_time
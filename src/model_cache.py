@@ -0,0 +1,180 @@
+"""
+模型缓存模块
+以“特征矩阵 + 模型声明 + 库版本”的内容哈希为键缓存训练好的模型及其预测结果，
+数据和参数都未变化时直接复用，按磁盘占用做LRU淘汰
+"""
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Optional, Union
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+
+class ModelCache:
+    """内容寻址的模型缓存类
+
+    每个条目是缓存目录下以键命名的子目录，包含 entry.joblib（模型及预测结果）
+    和 meta.json（模型名称、大小、创建时间）。命中时刷新 meta.json 的修改时间，
+    总大小超过上限时按修改时间从旧到新淘汰。
+    """
+    
+    ENTRY_FILE = "entry.joblib"
+    META_FILE = "meta.json"
+    
+    def __init__(self, cache_dir: str = "output/model_cache", max_bytes: int = 2 * 1024 ** 3):
+        """
+        初始化模型缓存
+        
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+    
+    def make_key(self, data_fingerprint: str, spec_config: Dict[str, Any], **extra: Any) -> str:
+        """
+        计算缓存键
+        
+        Args:
+            data_fingerprint: 训练数据指纹（见 fingerprint_data）
+            spec_config: 模型声明（ModelSpec.to_dict()）
+            **extra: 其他影响结果的参数（随机种子、测试集比例等）
+            
+        Returns:
+            十六进制缓存键
+        """
+        payload = {
+            'data': data_fingerprint,
+            'spec': spec_config,
+            'extra': extra,
+            'versions': library_versions(),
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存条目
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            命中时返回缓存的对象，否则返回None
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        meta_path = os.path.join(entry_dir, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        
+        try:
+            value = joblib.load(os.path.join(entry_dir, self.ENTRY_FILE))
+        except Exception:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        
+        os.utime(meta_path)
+        return value
+    
+    def put(self, key: str, value: Any, name: str = "") -> None:
+        """
+        写入缓存条目（先写临时目录再原子重命名），然后按需淘汰
+        
+        Args:
+            key: 缓存键
+            value: 要缓存的对象
+            name: 模型名称（仅用于元数据）
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry_dir = os.path.join(self.cache_dir, key)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.cache_dir)
+        try:
+            joblib.dump(value, os.path.join(tmp_dir, self.ENTRY_FILE))
+            size = _dir_size(tmp_dir)
+            with open(os.path.join(tmp_dir, self.META_FILE), "w", encoding="utf-8") as f:
+                json.dump({'name': name, 'size': size, 'created': time.time()}, f, ensure_ascii=False)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.rename(tmp_dir, entry_dir)
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        self.evict()
+    
+    def evict(self) -> None:
+        """总大小超过上限时，按最近使用时间从旧到新删除条目"""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self.cache_dir, key, self.META_FILE)
+            if not os.path.exists(meta_path):
+                continue
+            entries.append((os.path.getmtime(meta_path), _dir_size(os.path.join(self.cache_dir, key)), key))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total -= size
+            print(f"模型缓存超出上限，已淘汰: {key[:12]}")
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+
+def fingerprint_data(X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray]) -> str:
+    """
+    计算特征矩阵和目标变量的内容哈希（DataFrame 按列哈希，不构造整体副本）
+    
+    Args:
+        X: 特征数据
+        y: 目标变量
+        
+    Returns:
+        十六进制哈希
+    """
+    digest = hashlib.sha256()
+    if isinstance(X, pd.DataFrame):
+        for col in X.columns:
+            values = X[col].to_numpy()
+            digest.update(f"{col}:{values.dtype}".encode("utf-8"))
+            digest.update(np.ascontiguousarray(values).tobytes())
+    else:
+        digest.update(f"{X.shape}:{X.dtype}".encode("utf-8"))
+        digest.update(memoryview(np.ascontiguousarray(X)).cast('B'))
+    
+    y_values = y.to_numpy() if isinstance(y, pd.Series) else np.asarray(y)
+    digest.update(str(y_values.dtype).encode("utf-8"))
+    digest.update(np.ascontiguousarray(y_values).tobytes())
+    return digest.hexdigest()
+
+
+def library_versions() -> Dict[str, str]:
+    """影响模型序列化和训练结果的库版本"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def _dir_size(path: str) -> int:
+    """目录下所有文件的总字节数"""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path) for name in files
+    )
@@ -0,0 +1,258 @@
+"""
+模型注册表模块
+以“名称 → 估计器工厂、超参数、预处理需求、成本提示”的形式声明候选模型，
+可从JSON配置文件或命令行筛选，取代训练器中硬编码的模型字典
+"""
+
+import argparse
+import inspect
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+
+# 取值为少量离散编码、适合作为原生类别特征的列
+CATEGORICAL_FEATURES = ['season', 'mnth', 'hr', 'weekday', 'weathersit']
+
+# 配置文件中可引用的估计器
+ESTIMATORS: Dict[str, Callable[..., Any]] = {
+    'linear_regression': LinearRegression,
+    'random_forest': RandomForestRegressor,
+    'hist_gradient_boosting': HistGradientBoostingRegressor,
+}
+
+# 成本等级，从低到高
+COST_LEVELS = ['cheap', 'moderate', 'expensive']
+
+# 并行训练时按成本等级分配CPU核心的权重
+COST_WEIGHTS = {'cheap': 1, 'moderate': 2, 'expensive': 4}
+
+
+class ModelSpec:
+    """单个候选模型的声明"""
+    
+    def __init__(self, name: str, estimator: str, params: Optional[Dict[str, Any]] = None,
+                 scale: bool = False, adaptive: bool = False, categorical: bool = False,
+                 cost: str = 'cheap'):
+        """
+        初始化模型声明
+        
+        Args:
+            name: 模型显示名称（也用作结果字典的键和输出文件名）
+            estimator: 估计器名称，见 ESTIMATORS
+            params: 估计器超参数
+            scale: 是否需要标准化特征
+            adaptive: 是否支持按袋外误差自适应选择树数量（仅随机森林）
+            categorical: 是否把 CATEGORICAL_FEATURES 作为原生类别特征传入
+            cost: 成本提示，见 COST_LEVELS
+        """
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"未知的估计器 '{estimator}'，可选: {sorted(ESTIMATORS)}")
+        if cost not in COST_LEVELS:
+            raise ValueError(f"未知的成本等级 '{cost}'，可选: {COST_LEVELS}")
+        
+        self.name = name
+        self.estimator = estimator
+        self.params = dict(params or {})
+        self.scale = scale
+        self.adaptive = adaptive
+        self.categorical = categorical
+        self.cost = cost
+    
+    def build(self, random_state: Optional[int] = None,
+              feature_columns: Optional[Sequence[str]] = None,
+              n_jobs: Optional[int] = None) -> Any:
+        """
+        构造未训练的估计器
+        
+        Args:
+            random_state: 随机种子（估计器支持且配置未指定时注入）
+            feature_columns: 特征列名（用于生成类别特征掩码）
+            n_jobs: 覆盖估计器的并行度（估计器支持 n_jobs 时生效）
+            
+        Returns:
+            估计器实例
+        """
+        factory = ESTIMATORS[self.estimator]
+        params = dict(self.params)
+        accepted = inspect.signature(factory).parameters
+        
+        if 'random_state' in accepted and 'random_state' not in params and random_state is not None:
+            params['random_state'] = random_state
+        
+        if n_jobs is not None and 'n_jobs' in accepted:
+            params['n_jobs'] = n_jobs
+        
+        if self.categorical and 'categorical_features' in accepted and feature_columns:
+            mask = np.array([col in CATEGORICAL_FEATURES for col in feature_columns])
+            if mask.any():
+                params['categorical_features'] = mask
+        
+        return factory(**params)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可写入配置文件的字典"""
+        return {
+            'name': self.name,
+            'estimator': self.estimator,
+            'params': self.params,
+            'scale': self.scale,
+            'adaptive': self.adaptive,
+            'categorical': self.categorical,
+            'cost': self.cost,
+        }
+
+
+def allocate_cores(specs: Sequence[ModelSpec], total_cores: int) -> List[int]:
+    """
+    按成本权重在并发训练的模型之间分配CPU核心，每个模型至少1个
+    
+    Args:
+        specs: 并发训练的模型声明
+        total_cores: 可用核心数
+        
+    Returns:
+        与 specs 一一对应的核心数
+    """
+    weights = [COST_WEIGHTS[spec.cost] for spec in specs]
+    total_weight = sum(weights)
+    return [max(1, total_cores * weight // total_weight) for weight in weights]
+
+
+class ModelRegistry:
+    """模型注册表类"""
+    
+    def __init__(self, specs: Optional[Sequence[ModelSpec]] = None):
+        """
+        初始化模型注册表
+        
+        Args:
+            specs: 初始模型声明（按训练顺序）
+        """
+        self.specs: Dict[str, ModelSpec] = {}
+        for spec in specs or []:
+            self.register(spec)
+    
+    @classmethod
+    def default(cls) -> "ModelRegistry":
+        """
+        默认注册表：线性回归、1000棵树的随机森林和直方图梯度提升
+        
+        Returns:
+            模型注册表
+        """
+        return cls([
+            ModelSpec('Linear Regression', 'linear_regression', scale=True, cost='cheap'),
+            ModelSpec('Random Forest', 'random_forest',
+                      params={'n_estimators': 1000, 'max_depth': 10, 'n_jobs': -1},
+                      adaptive=True, cost='expensive'),
+            ModelSpec('Gradient Boosting', 'hist_gradient_boosting',
+                      params={'max_iter': 500, 'learning_rate': 0.1, 'early_stopping': True,
+                              'validation_fraction': 0.1, 'n_iter_no_change': 20},
+                      categorical=True, cost='moderate'),
+        ])
+    
+    @classmethod
+    def from_file(cls, path: str) -> "ModelRegistry":
+        """
+        从JSON配置文件加载注册表
+        
+        文件格式: {"models": [{"name": ..., "estimator": ..., "params": {...},
+                               "scale": false, "categorical": false, "cost": "cheap"}, ...]}
+        
+        Args:
+            path: 配置文件路径
+            
+        Returns:
+            模型注册表
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return cls([ModelSpec(**entry) for entry in config['models']])
+    
+    def save(self, path: str) -> None:
+        """
+        保存为JSON配置文件
+        
+        Args:
+            path: 配置文件路径
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'models': [spec.to_dict() for spec in self.specs.values()]},
+                      f, ensure_ascii=False, indent=2)
+    
+    def register(self, spec: ModelSpec) -> None:
+        """
+        注册（或覆盖）一个模型声明
+        
+        Args:
+            spec: 模型声明
+        """
+        self.specs[spec.name] = spec
+    
+    def get(self, name: str) -> ModelSpec:
+        """
+        按名称获取模型声明
+        
+        Raises:
+            KeyError: 如果模型未注册
+        """
+        if name not in self.specs:
+            raise KeyError(f"模型 '{name}' 未注册，可选: {list(self.specs)}")
+        return self.specs[name]
+    
+    def select(self, names: Optional[Sequence[str]] = None,
+               max_cost: Optional[str] = None) -> List[ModelSpec]:
+        """
+        按名称和成本上限筛选模型
+        
+        Args:
+            names: 要训练的模型名称，None表示全部
+            max_cost: 成本上限，如 'cheap' 只保留低成本模型
+            
+        Returns:
+            筛选后的模型声明列表
+            
+        Raises:
+            ValueError: 如果筛选结果为空
+        """
+        specs = [self.get(name) for name in names] if names else list(self.specs.values())
+        if max_cost is not None:
+            limit = COST_LEVELS.index(max_cost)
+            specs = [spec for spec in specs if COST_LEVELS.index(spec.cost) <= limit]
+        if not specs:
+            raise ValueError("没有符合条件的模型")
+        return specs
+
+
+def add_registry_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    为命令行解析器添加模型选择参数
+    
+    Args:
+        parser: 命令行解析器
+    """
+    parser.add_argument('--model-config', default=None,
+                        help="模型配置JSON文件（默认使用内置注册表）")
+    parser.add_argument('--models', nargs='+', default=None,
+                        help="只训练指定名称的模型")
+    parser.add_argument('--max-cost', choices=COST_LEVELS, default=None,
+                        help="只训练不超过该成本等级的模型")
+
+
+def registry_from_args(args: argparse.Namespace) -> ModelRegistry:
+    """
+    根据命令行参数构造注册表
+    
+    Args:
+        args: 解析后的命令行参数
+        
+    Returns:
+        模型注册表
+    """
+    if args.model_config:
+        return ModelRegistry.from_file(args.model_config)
+    return ModelRegistry.default()
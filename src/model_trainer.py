@@ -3,38 +3,78 @@
 负责训练和评估回归模型
 """
 
+import copy
+import os
+import pickle
+import tempfile
+import time
+import joblib
 import numpy as np
 import pandas as pd
-from typing import Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
+from sklearn.inspection import permutation_importance
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from sklearn.utils import check_random_state
+
+from .compact_forest import CompactForest, select_trees
+from .data_preprocessor import DataPreprocessor, LagFeatureState, PreprocessingArtifact
+from .feature_store import write_shared_array
+from .forecaster import Forecaster
+from .hyperparameter_search import SuccessiveHalvingSearch
+from .model_cache import ModelCache, fingerprint_data
+from .model_registry import ModelRegistry, ModelSpec, allocate_cores
+from .prediction_table import DEFAULT_LEVELS, PredictionLookupTable
+from .quantile_forest import DEFAULT_QUANTILES, QuantileForest
 
 
 class ModelTrainer:
     """模型训练器类"""
     
-    def __init__(self, random_state: int = 42):
+    def __init__(self, random_state: int = 42, preprocessor: Optional[DataPreprocessor] = None,
+                 registry: Optional[ModelRegistry] = None, cache: Optional[ModelCache] = None):
         """
         初始化模型训练器
         
         Args:
             random_state: 随机种子
+            preprocessor: 用于在训练集上生成预处理产物的预处理器
+            registry: 候选模型注册表，默认使用内置注册表
+            cache: 模型缓存，数据和模型声明未变化时直接复用已训练的模型，None表示不缓存
         """
         self.random_state = random_state
+        self.preprocessor = preprocessor or DataPreprocessor()
+        self.registry = registry or ModelRegistry.default()
+        self.cache = cache
         self.models = {}
+        self.artifacts = {}
+        self.results = {}
         self.best_model = None
         self.best_model_name = None
+        self.train_split = None
+        self.test_split = None
+        self.quantile_forest = None
+        self._quantile_key = None
     
-    def train_models(self, X: pd.DataFrame, y: pd.Series, test_size: float = 0.2) -> Dict[str, Dict]:
+    def train_models(self, X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray],
+                     test_size: float = 0.2, adaptive_forest: bool = False,
+                     model_names: Optional[Sequence[str]] = None,
+                     max_cost: Optional[str] = None, parallel: bool = False,
+                     n_workers: Optional[int] = None) -> Dict[str, Dict]:
         """
         训练多个模型并比较性能
         
         Args:
-            X: 特征数据
+            X: 特征数据（DataFrame，或来自特征库的float32内存映射数组）
             y: 目标变量
             test_size: 测试集比例
+            adaptive_forest: 是否按袋外误差自适应选择随机森林的树数量
+            model_names: 只训练注册表中的这些模型，None表示全部
+            max_cost: 只训练不超过该成本等级的模型
+            parallel: 是否在进程池中并发训练各模型
+            n_workers: 并发进程数，默认为模型数量与CPU核心数的较小值
             
         Returns:
             包含各模型评估指标的字典
@@ -45,30 +85,63 @@ class ModelTrainer:
         )
         
         print(f"\n数据划分: 训练集 {len(X_train)} 条, 测试集 {len(X_test)} 条\n")
+        self.train_split = (X_train, y_train)
+        self.test_split = (X_test, y_test)
+        self.quantile_forest = None
+        self._quantile_key = None
         
-        # 定义要训练的模型
-        models_to_train = {
-            'Linear Regression': LinearRegression(),
-            'Random Forest': RandomForestRegressor(
-                n_estimators=1000,
-                max_depth=10,
-                random_state=self.random_state,
-                n_jobs=-1
-            )
-        }
+        # 从注册表取出要训练的模型及其预处理需求（树模型对特征尺度不敏感，直接使用原始紧凑矩阵）
+        specs = self.registry.select(model_names, max_cost)
+        feature_names = self._feature_names(X)
         
-        results = {}
+        # 只有需要标准化的模型才计算标准化矩阵，且在多个模型间复用
+        prepared = []
+        scaled_split = None
+        raw_artifact = None
+        for spec in specs:
+            if spec.scale:
+                if scaled_split is None:
+                    scaled_split = self._scale_split(X_train, X_test)
+                prepared.append((spec, *scaled_split))
+            else:
+                if raw_artifact is None:
+                    raw_artifact = self.preprocessor.fit_artifact(X_train, scale=False)
+                prepared.append((spec, raw_artifact, X_train, X_test))
         
-        # 训练每个模型
-        for name, model in models_to_train.items():
-            print(f"正在训练 {name}...")
-            
-            # 训练模型
-            model.fit(X_train, y_train)
-            
-            # 预测
-            y_train_pred = model.predict(X_train)
-            y_test_pred = model.predict(X_test)
+        # 查询模型缓存（键包含数据指纹、模型声明、划分参数和库版本）
+        fitted = [None] * len(prepared)
+        cache_keys = [None] * len(prepared)
+        if self.cache is not None:
+            data_fingerprint = fingerprint_data(X, y)
+            for i, (spec, _, _, _) in enumerate(prepared):
+                cache_keys[i] = self.cache.make_key(
+                    data_fingerprint, spec.to_dict(), random_state=self.random_state,
+                    test_size=test_size, adaptive_forest=adaptive_forest, feature_names=feature_names
+                )
+                fitted[i] = self.cache.get(cache_keys[i])
+                if fitted[i] is not None:
+                    print(f"模型缓存命中: {spec.name}")
+        pending = [i for i, entry in enumerate(fitted) if entry is None]
+        
+        # 训练未命中的模型（并行时各模型在独立进程中训练，共享内存映射的训练数据）
+        if parallel and len(pending) > 1:
+            new_fits = self._fit_parallel([prepared[i] for i in pending], y_train, feature_names,
+                                          adaptive_forest, n_workers)
+        else:
+            new_fits = [
+                self._fit_one(prepared[i][0], prepared[i][2], prepared[i][3], y_train,
+                              feature_names, adaptive_forest)
+                for i in pending
+            ]
+        for i, entry in zip(pending, new_fits):
+            fitted[i] = entry
+            if self.cache is not None:
+                self.cache.put(cache_keys[i], entry, name=prepared[i][0].name)
+        
+        results = {}
+        for (spec, artifact, _, _), (model, y_train_pred, y_test_pred, adaptive_report) in zip(prepared, fitted):
+            name = spec.name
+            print(f"\n【{name}】")
             
             # 计算评估指标
             train_metrics = self._calculate_metrics(y_train, y_train_pred, "训练集")
@@ -81,8 +154,13 @@ class ModelTrainer:
                 'y_test': y_test,
                 'y_test_pred': y_test_pred
             }
+            if adaptive_report is not None:
+                results[name]['adaptive_report'] = adaptive_report
             
             self.models[name] = model
+            self.artifacts[name] = artifact
+        
+        self.results = results
         
         # 选择最佳模型（基于测试集R²分数）
         best_name = max(results.keys(), key=lambda k: results[k]['test_metrics']['r2_score'])
@@ -94,6 +172,320 @@ class ModelTrainer:
         
         return results
     
+    def _fit_one(self, spec: ModelSpec, X_train: Union[pd.DataFrame, np.ndarray],
+                 X_test: Union[pd.DataFrame, np.ndarray], y_train: Union[pd.Series, np.ndarray],
+                 feature_names: Optional[List[str]], adaptive_forest: bool,
+                 n_jobs: Optional[int] = None) -> Tuple[object, np.ndarray, np.ndarray, Optional[Dict]]:
+        """
+        训练单个模型并预测训练集和测试集
+        
+        Args:
+            spec: 模型声明
+            X_train: 训练集特征（已按模型需求预处理）
+            X_test: 测试集特征（已按模型需求预处理）
+            y_train: 训练集目标变量
+            feature_names: 特征列名
+            adaptive_forest: 是否自适应选择随机森林的树数量
+            n_jobs: 覆盖估计器的并行度
+            
+        Returns:
+            (训练好的模型, 训练集预测, 测试集预测, 自适应报告或None)
+        """
+        print(f"正在训练 {spec.name}...")
+        model = spec.build(self.random_state, feature_names, n_jobs=n_jobs)
+        
+        if adaptive_forest and spec.adaptive and getattr(model, 'bootstrap', False):
+            model, adaptive_report = self.fit_forest_adaptive(X_train, y_train, model=model)
+        else:
+            model.fit(X_train, y_train)
+            adaptive_report = None
+        
+        # 预测
+        return model, model.predict(X_train), model.predict(X_test), adaptive_report
+    
+    def _fit_parallel(self, prepared: List[Tuple], y_train: Union[pd.Series, np.ndarray],
+                      feature_names: Optional[List[str]], adaptive_forest: bool,
+                      n_workers: Optional[int]) -> List[Tuple[object, np.ndarray, np.ndarray, Optional[Dict]]]:
+        """
+        在进程池中并发训练多个模型
+        
+        训练数据先写入临时目录下的 .npy 文件，各工作进程以只读内存映射打开，共享同一份页缓存。
+        CPU核心按成本等级在模型间分配：支持 n_jobs 的估计器直接设置 n_jobs，
+        其余估计器（如使用OpenMP的梯度提升）通过 threadpoolctl 限制线程数，避免超额订阅。
+        
+        Args:
+            prepared: [(模型声明, 预处理产物, 训练集特征, 测试集特征), ...]
+            y_train: 训练集目标变量
+            feature_names: 特征列名
+            adaptive_forest: 是否自适应选择随机森林的树数量
+            n_workers: 并发进程数
+            
+        Returns:
+            与 prepared 一一对应的 (模型, 训练集预测, 测试集预测, 自适应报告)
+        """
+        total_cores = os.cpu_count() or 1
+        n_workers = n_workers or min(len(prepared), total_cores)
+        cores = allocate_cores([spec for spec, *_ in prepared], total_cores)
+        
+        with tempfile.TemporaryDirectory(prefix="bike_train_") as tmp_dir:
+            paths = {'y_train': write_shared_array(tmp_dir, 'y_train', y_train)}
+            tasks = []
+            for i, ((spec, _, X_train_used, X_test_used), n_cores) in enumerate(zip(prepared, cores)):
+                # 标准化矩阵在多个模型间是同一对象，只写一次
+                key = f"X_{id(X_train_used)}"
+                if key not in paths:
+                    paths[key] = (write_shared_array(tmp_dir, f"{key}_train", X_train_used),
+                                  write_shared_array(tmp_dir, f"{key}_test", X_test_used))
+                print(f"调度 {spec.name}: {n_cores} 个核心")
+                tasks.append((spec.to_dict(), self.random_state, feature_names, paths[key],
+                              paths['y_train'], adaptive_forest, n_cores))
+            
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                fitted = list(executor.map(_fit_worker, tasks))
+            print(f"\n并行训练 {len(tasks)} 个模型耗时 {time.perf_counter() - start:.1f} s")
+        
+        return fitted
+    
+    def cross_validate_time_series(self, X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray],
+                                   n_splits: int = 5, window: str = 'expanding',
+                                   max_train_size: Optional[int] = None, gap: int = 0,
+                                   order: Optional[np.ndarray] = None,
+                                   model_names: Optional[Sequence[str]] = None,
+                                   max_cost: Optional[str] = None, parallel: bool = True,
+                                   n_workers: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        按时间顺序的滚动起点交叉验证，各折在工作进程中并行执行
+        
+        每一折只用较早的时间段训练、紧随其后的时间段测试，避免未来数据泄漏到训练集。
+        数据按时间排序后写入一个共享的 .npy 文件，每折的训练/测试集都是其中的连续区间，
+        工作进程以内存映射切片读取，不复制特征矩阵。
+        
+        Args:
+            X: 特征数据
+            y: 目标变量
+            n_splits: 折数
+            window: 'expanding' 训练集从最早时刻起逐折扩展；'rolling' 训练集为固定长度的滑动窗口
+            max_train_size: 滑动窗口长度，默认为每折测试集长度的2倍
+            gap: 训练集末尾与测试集开头之间跳过的样本数
+            order: 每行的时间键（如由 dteday/hr 计算的小时序号），None表示数据已按时间排列
+            model_names: 只评估注册表中的这些模型
+            max_cost: 只评估不超过该成本等级的模型
+            parallel: 是否在进程池中并行执行各折
+            n_workers: 并发进程数
+            
+        Returns:
+            {'models': {模型名称: {'folds': 每折指标列表, 'mean': 平均指标, 'std': 指标标准差}},
+             'wall_time': 总耗时秒数}
+        """
+        from sklearn.model_selection import TimeSeriesSplit
+        
+        if window not in ('expanding', 'rolling'):
+            raise ValueError(f"未知的窗口类型 '{window}'，可选: 'expanding', 'rolling'")
+        
+        n_samples = len(X)
+        if window == 'rolling' and max_train_size is None:
+            max_train_size = 2 * (n_samples // (n_splits + 1))
+        splitter = TimeSeriesSplit(n_splits=n_splits, gap=gap,
+                                   max_train_size=max_train_size if window == 'rolling' else None)
+        folds = [
+            ((int(train[0]), int(train[-1]) + 1), (int(test[0]), int(test[-1]) + 1))
+            for train, test in splitter.split(np.empty((n_samples, 1)))
+        ]
+        
+        specs = self.registry.select(model_names, max_cost)
+        feature_names = self._feature_names(X)
+        
+        total_cores = os.cpu_count() or 1
+        n_tasks = len(specs) * len(folds)
+        n_workers = n_workers or min(n_tasks, total_cores)
+        cores_per_task = max(1, total_cores // n_workers) if parallel else -1
+        
+        print(f"\n时间序列交叉验证: {len(folds)} 折 ({window}), {len(specs)} 个模型, "
+              f"{'并行 ' + str(n_workers) + ' 个进程' if parallel else '顺序执行'}")
+        
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix="bike_cv_") as tmp_dir:
+            permutation = None if order is None else np.argsort(np.asarray(order), kind='stable')
+            X_values = X.to_numpy() if isinstance(X, pd.DataFrame) else X
+            y_values = y.to_numpy() if isinstance(y, pd.Series) else y
+            if permutation is not None:
+                X_values, y_values = X_values[permutation], y_values[permutation]
+            X_path = write_shared_array(tmp_dir, 'X', X_values)
+            y_path = write_shared_array(tmp_dir, 'y', y_values)
+            del X_values, y_values
+            
+            tasks = [
+                (spec.to_dict(), self.random_state, feature_names, X_path, y_path,
+                 fold, train_range, test_range, cores_per_task)
+                for spec in specs for fold, (train_range, test_range) in enumerate(folds, 1)
+            ]
+            if parallel and n_tasks > 1:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    fold_metrics = list(executor.map(_cv_worker, tasks))
+            else:
+                fold_metrics = [_cv_worker(task) for task in tasks]
+        wall_time = time.perf_counter() - start
+        
+        results = {'models': {}, 'wall_time': wall_time}
+        for i, spec in enumerate(specs):
+            per_fold = fold_metrics[i * len(folds):(i + 1) * len(folds)]
+            frame = pd.DataFrame(per_fold)
+            metric_columns = ['rmse', 'mae', 'r2_score', 'fit_time']
+            results['models'][spec.name] = {
+                'folds': per_fold,
+                'mean': frame[metric_columns].mean().to_dict(),
+                'std': frame[metric_columns].std(ddof=0).to_dict()
+            }
+            
+            print(f"\n【{spec.name}】")
+            print(frame[['fold', 'train_size', 'test_size', *metric_columns]].to_string(index=False,
+                                                                                      float_format='%.4f'))
+            mean, std = results['models'][spec.name]['mean'], results['models'][spec.name]['std']
+            print(f"  平均: RMSE={mean['rmse']:.2f}±{std['rmse']:.2f}, "
+                  f"MAE={mean['mae']:.2f}±{std['mae']:.2f}, R²={mean['r2_score']:.4f}±{std['r2_score']:.4f}")
+        
+        print(f"\n交叉验证总耗时: {wall_time:.1f} s")
+        return results
+    
+    def search_hyperparameters(self, X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray],
+                               model_name: str = 'Random Forest', apply: bool = True,
+                               log_path: Optional[str] = None, **kwargs) -> Dict:
+        """
+        以连续减半/Hyperband 在时间预算内搜索注册表中某个模型的超参数
+        
+        Args:
+            X: 特征数据（按时间顺序排列）
+            y: 目标变量
+            model_name: 注册表中的模型名称
+            apply: 是否把最优参数写回注册表，供后续 train_models 使用
+            log_path: 试验日志路径，默认为 output/search/<模型名>_trials.jsonl
+            **kwargs: 传给 SuccessiveHalvingSearch 的参数（param_space、time_budget、hyperband、n_workers等）
+            
+        Returns:
+            搜索结果字典（best_params、best_rmse、trials、status、elapsed）
+        """
+        spec = self.registry.get(model_name)
+        if log_path is None:
+            log_path = os.path.join("output", "search", f"{model_name.lower().replace(' ', '_')}_trials.jsonl")
+        
+        search = SuccessiveHalvingSearch(spec, log_path=log_path, random_state=self.random_state, **kwargs)
+        result = search.run(X, y, feature_names=self._feature_names(X))
+        
+        if apply:
+            spec.params.update(result['best_params'])
+            print(f"已将最优参数写回注册表: {model_name} -> {spec.params}")
+        return result
+    
+    def fit_forest_adaptive(self, X_train: Union[pd.DataFrame, np.ndarray], y_train: Union[pd.Series, np.ndarray],
+                            step: int = 50, max_estimators: int = 1000, tol: float = 1e-3,
+                            max_depth: Optional[int] = 10, n_jobs: Optional[int] = -1,
+                            model: Optional[RandomForestRegressor] = None) -> Tuple[RandomForestRegressor, Dict]:
+        """
+        以 warm_start 分批增加树的数量，袋外(OOB) RMSE 的相对改善低于阈值时停止
+        
+        传入 model 时在该估计器上增长（保留其全部参数，树数量上限取其 n_estimators），
+        忽略 max_estimators、max_depth 和 n_jobs。
+        
+        Args:
+            X_train: 训练集特征
+            y_train: 训练集目标变量
+            step: 每批新增的树数量
+            max_estimators: 树数量上限
+            tol: 相对改善阈值，(上一批RMSE - 本批RMSE) / 上一批RMSE 低于该值即停止
+            max_depth: 树的最大深度
+            n_jobs: 并行训练使用的核心数
+            model: 未训练的随机森林（如由注册表或搜索结果构建），需 bootstrap=True
+            
+        Returns:
+            (训练好的随机森林, 包含所选树数量、每批OOB RMSE和耗时估计的报告)
+        """
+        if model is None:
+            model = RandomForestRegressor(
+                n_estimators=max_estimators,
+                max_depth=max_depth,
+                random_state=self.random_state,
+                n_jobs=n_jobs
+            )
+        elif not model.bootstrap:
+            raise ValueError("自适应树数量依赖袋外误差，需要 bootstrap=True 的随机森林")
+        max_estimators = model.n_estimators
+        model.set_params(warm_start=True, oob_score=True, n_estimators=min(step, max_estimators))
+        y_true = np.asarray(y_train, dtype=np.float64)
+        history = []
+        start = time.perf_counter()
+        
+        while True:
+            model.fit(X_train, y_train)
+            oob_rmse = float(np.sqrt(np.mean((y_true - model.oob_prediction_) ** 2)))
+            history.append({
+                'n_estimators': model.n_estimators,
+                'oob_rmse': oob_rmse,
+                'elapsed': time.perf_counter() - start
+            })
+            print(f"  树数量 {model.n_estimators:5d}: OOB RMSE = {oob_rmse:.3f}")
+            
+            if len(history) > 1:
+                previous = history[-2]['oob_rmse']
+                if (previous - oob_rmse) / previous < tol:
+                    break
+            if model.n_estimators >= max_estimators:
+                break
+            model.n_estimators = min(model.n_estimators + step, max_estimators)
+        
+        elapsed = history[-1]['elapsed']
+        chosen = model.n_estimators
+        # 按实际每棵树的平均耗时估算训练到上限所需时间
+        estimated_full = elapsed / chosen * max_estimators
+        report = {
+            'n_estimators': chosen,
+            'max_estimators': max_estimators,
+            'history': history,
+            'fit_time': elapsed,
+            'estimated_time_saved': max(estimated_full - elapsed, 0.0)
+        }
+        print(f"  选定树数量: {chosen} / {max_estimators}, 训练耗时 {elapsed:.1f} s, "
+              f"预计节省 {report['estimated_time_saved']:.1f} s")
+        return model, report
+    
+    def _feature_names(self, X: Union[pd.DataFrame, np.ndarray]) -> Optional[List[str]]:
+        """获取特征列名（ndarray输入时取自预处理器）"""
+        if isinstance(X, pd.DataFrame):
+            return X.columns.tolist()
+        return self.preprocessor.feature_columns
+    
+    def _scale_split(self, X_train: Union[pd.DataFrame, np.ndarray],
+                     X_test: Union[pd.DataFrame, np.ndarray]) -> Tuple[PreprocessingArtifact, np.ndarray, np.ndarray]:
+        """
+        仅在训练集上拟合标准化产物，并生成float32的标准化训练/测试矩阵
+        
+        Args:
+            X_train: 训练集特征
+            X_test: 测试集特征
+            
+        Returns:
+            (预处理产物, 标准化后的训练集, 标准化后的测试集)
+        """
+        artifact = self.preprocessor.fit_artifact(X_train, scale=True)
+        return artifact, artifact.transform(X_train), artifact.transform(X_test)
+    
+    def train_from_store(self, store, test_size: float = 0.2, **kwargs) -> Dict[str, Dict]:
+        """
+        从内存映射特征库零拷贝打开特征矩阵并训练模型
+        
+        Args:
+            store: FeatureStore 实例
+            test_size: 测试集比例
+            **kwargs: 传给 train_models 的其他参数（adaptive_forest、model_names、max_cost、parallel等）
+            
+        Returns:
+            包含各模型评估指标的字典
+        """
+        X, y, feature_columns = store.load(mmap=True)
+        if self.preprocessor.feature_columns is None:
+            self.preprocessor.feature_columns = feature_columns
+        return self.train_models(X, y, test_size=test_size, **kwargs)
+    
     def _calculate_metrics(self, y_true: np.ndarray, y_pred: np.ndarray, dataset_name: str = "") -> Dict[str, float]:
         """
         计算回归评估指标
@@ -127,28 +519,228 @@ class ModelTrainer:
         
         return metrics
     
-    def get_feature_importance(self) -> np.ndarray:
+    def get_best_artifact(self) -> PreprocessingArtifact:
+        """
+        获取最佳模型对应的预处理产物（用于推理服务）
+        
+        Returns:
+            预处理产物
+        """
+        if self.best_model is None:
+            raise ValueError("模型尚未训练")
+        return self.artifacts[self.best_model_name]
+    
+    def save_best_model(self, path: str) -> None:
+        """
+        保存最佳模型（joblib格式，供预测服务加载）
+        
+        Args:
+            path: 保存路径
+        """
+        if self.best_model is None:
+            raise ValueError("模型尚未训练")
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump(self.best_model, path)
+        print(f"最佳模型已保存至: {path}")
+    
+    def export_forest(self, path: str, model_name: str = 'Random Forest') -> CompactForest:
+        """
+        将训练好的随机森林导出为可内存映射的紧凑森林文件（推理服务冷启动时直接映射）
+        
+        Args:
+            path: 输出文件路径
+            model_name: 要导出的森林模型名称
+            
+        Returns:
+            紧凑森林
+        """
+        if model_name not in self.models:
+            raise ValueError(f"模型尚未训练: {model_name}")
+        
+        forest = CompactForest.from_estimator(self.models[model_name],
+                                              self.artifacts[model_name].feature_columns)
+        forest.save(path)
+        return forest
+    
+    def compress_forest(self, tolerance: float = 0.01, model_name: str = 'Random Forest',
+                        max_trees: Optional[int] = None) -> Dict:
+        """
+        按训练集的袋外(OOB)预测选择随机森林的树子集，使袋外RMSE不超过完整森林的 (1 + tolerance) 倍
+        
+        选树不使用测试集，报告的测试集RMSE是无偏的。压缩后的模型替换 self.models 中的森林
+        （最佳模型为该森林时一并替换），self.results 中该模型的指标和测试集预测按压缩后的
+        模型重新计算，并报告压缩前后的树数量、模型字节数和单行预测延迟。
+        
+        Args:
+            tolerance: 允许的袋外RMSE相对增幅
+            model_name: 要压缩的森林模型名称（必须以 bootstrap=True 训练）
+            max_trees: 最多保留的树数量
+            
+        Returns:
+            压缩报告字典（包含 model、forest、tree_indices、summary）
+        """
+        if model_name not in self.models or self.test_split is None:
+            raise ValueError(f"模型尚未训练: {model_name}")
+        
+        model = self.models[model_name]
+        artifact = self.artifacts[model_name]
+        X_train, y_train = self.train_split
+        X_test, y_test = self.test_split
+        X_fit = artifact.transform(X_train) if artifact.scaled else X_train
+        X_eval = artifact.transform(X_test) if artifact.scaled else X_test
+        
+        full_forest = CompactForest.from_estimator(model, artifact.feature_columns)
+        oob_mask = _oob_mask(model, len(X_fit))
+        tree_indices = select_trees(full_forest, X_fit, y_train, tolerance, max_trees, oob_mask=oob_mask)
+        forest = full_forest.select(tree_indices)
+        
+        pruned = copy.copy(model)
+        pruned.estimators_ = [model.estimators_[i] for i in tree_indices]
+        pruned.n_estimators = len(tree_indices)
+        
+        rows = []
+        for label, sk_model, compact in [('完整森林', model, full_forest), ('压缩森林', pruned, forest)]:
+            y_pred = compact.predict(X_eval)
+            rows.append({
+                '模型': label,
+                '树数量': compact.n_trees,
+                'pickle大小(MB)': round(len(pickle.dumps(sk_model)) / 1024 ** 2, 2),
+                '紧凑格式(MB)': round(compact.nbytes / 1024 ** 2, 2),
+                'sklearn单行(ms)': round(_row_latency(sk_model.predict, X_eval), 3),
+                '紧凑森林单行(ms)': round(_row_latency(compact.predict, X_eval), 3),
+                '测试集RMSE': round(float(np.sqrt(mean_squared_error(y_test, y_pred))), 2),
+            })
+        summary = pd.DataFrame(rows)
+        
+        print(f"\n【{model_name} 压缩】容差 {tolerance:.1%}")
+        print(summary.to_string(index=False))
+        
+        self.models[model_name] = pruned
+        if self.best_model_name == model_name:
+            self.best_model = pruned
+        if model_name in self.results:
+            print(f"\n【{model_name}（压缩后）】")
+            y_test_pred = forest.predict(X_eval)
+            self.results[model_name].update({
+                'model': pruned,
+                'train_metrics': self._calculate_metrics(y_train, forest.predict(X_fit), "训练集"),
+                'test_metrics': self._calculate_metrics(y_test, y_test_pred, "测试集"),
+                'y_test_pred': y_test_pred,
+            })
+        self.quantile_forest = None
+        self._quantile_key = None
+        
+        return {'model': pruned, 'forest': forest, 'tree_indices': tree_indices, 'summary': summary}
+    
+    def build_lookup_table(self, X_reference: Union[pd.DataFrame, np.ndarray],
+                           levels: Sequence[int] = DEFAULT_LEVELS) -> PredictionLookupTable:
+        """
+        用最佳模型在所有日历组合 × 量化天气网格上预计算查找表
+        
+        Args:
+            X_reference: 参考数据（通常为训练集），决定合法日历组合和天气取值范围
+            levels: 各天气特征的网格点数
+            
+        Returns:
+            查找表（未覆盖的日历组合回退到最佳模型预测）
+        """
+        artifact = self.get_best_artifact()
+        table = PredictionLookupTable.build(self.predict, X_reference, artifact.feature_columns, levels)
+        table.fallback = self.predict
+        return table
+    
+    def forecast(self, start: Union[str, pd.Timestamp], weather: pd.DataFrame, horizon: Optional[int] = None,
+                 lag_state: Optional[LagFeatureState] = None) -> pd.Series:
+        """
+        用最佳模型预测从 start 起未来 horizon 小时（如24或168）
+        
+        Args:
+            start: 起始时刻
+            weather: 天气预报（weathersit、temp、atemp、hum、windspeed 列，按小时排列）
+            horizon: 预测小时数，默认为天气预报的长度
+            lag_state: 截至预测起点的滞后特征状态（使用滞后特征训练时必需）
+            
+        Returns:
+            以时刻为索引的预测值Series
+        """
+        artifact = self.get_best_artifact()
+        forecaster = Forecaster(lambda X: self.best_model.predict(artifact.transform(X)),
+                                artifact.feature_columns, lag_state)
+        return forecaster.forecast(start, weather, horizon)
+    
+    def predict_intervals(self, X: Union[pd.DataFrame, np.ndarray],
+                          quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                          model_name: str = 'Random Forest') -> pd.DataFrame:
+        """
+        用已训练随机森林的叶子分配预测分位数区间（如 P10/P90），无需重新训练
+        
+        首次调用时按训练集的叶子分配统计各叶子的分位数，之后对同一模型、同一组分位数复用。
+        
+        Args:
+            X: 特征数据
+            quantiles: 分位数水平
+            model_name: 森林模型名称
+            
+        Returns:
+            DataFrame，列为 mean 以及 p10/p50/p90 等分位数
+        """
+        if model_name not in self.models or self.train_split is None:
+            raise ValueError(f"模型尚未训练: {model_name}")
+        
+        artifact = self.artifacts[model_name]
+        model = self.models[model_name]
+        key = (model_name, id(model), tuple(quantiles))
+        if self.quantile_forest is None or key != self._quantile_key:
+            X_train, y_train = self.train_split
+            X_fit = artifact.transform(X_train) if artifact.scaled else X_train
+            forest = CompactForest.from_estimator(model, artifact.feature_columns)
+            self.quantile_forest = QuantileForest.fit(forest, X_fit, y_train, quantiles)
+            self._quantile_key = key
+        
+        if artifact.scaled:
+            X = artifact.transform(X)
+        return self.quantile_forest.predict(X)
+    
+    def get_feature_importance(self, n_repeats: int = 5, max_rows: int = 2000) -> Tuple[np.ndarray, str]:
         """
         获取最佳模型的特征重要性
         
+        最佳模型提供 feature_importances_（如随机森林）时直接使用；否则（梯度提升、线性回归等）
+        在测试集上计算置换重要性：逐列打乱后 R² 的平均下降量，负值截断为0。
+        
+        Args:
+            n_repeats: 置换重要性中每列打乱的次数
+            max_rows: 置换重要性最多使用的测试集行数
+        
         Returns:
-            特征重要性数组
+            (特征重要性数组, 重要性来源说明，如 "Random Forest" 或 "Gradient Boosting（置换重要性）")
             
         Raises:
-            ValueError: 如果模型不是RandomForest或未训练
+            ValueError: 如果模型尚未训练
         """
-        if self.best_model is None:
+        if self.best_model is None or self.test_split is None:
             raise ValueError("模型尚未训练")
         
         if hasattr(self.best_model, 'feature_importances_'):
-            return self.best_model.feature_importances_
-        elif hasattr(self.best_model, 'coef_'):
-            # 对于线性回归，使用系数的绝对值作为重要性
-            return np.abs(self.best_model.coef_)
-        else:
-            raise ValueError("模型不支持特征重要性提取")
+            return np.asarray(self.best_model.feature_importances_), self.best_model_name
+        
+        X_test, y_test = self.test_split
+        rows = np.random.default_rng(self.random_state).permutation(len(X_test))[:max_rows]
+        rows.sort()
+        X_eval = X_test.iloc[rows] if isinstance(X_test, pd.DataFrame) else np.asarray(X_test[rows])
+        y_eval = y_test.iloc[rows] if isinstance(y_test, pd.Series) else np.asarray(y_test[rows])
+        artifact = self.get_best_artifact()
+        if artifact.scaled:
+            X_eval = artifact.transform(X_eval)
+        
+        result = permutation_importance(self.best_model, X_eval, y_eval, n_repeats=n_repeats,
+                                        random_state=self.random_state)
+        return np.clip(result.importances_mean, 0.0, None), f"{self.best_model_name}（置换重要性）"
     
-    def predict(self, X: pd.DataFrame) -> np.ndarray:
+    def predict(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
         """
         使用最佳模型进行预测
         
@@ -161,5 +753,115 @@ class ModelTrainer:
         if self.best_model is None:
             raise ValueError("模型尚未训练")
         
+        artifact = self.artifacts.get(self.best_model_name)
+        if artifact is not None and artifact.scaled:
+            X = artifact.transform(X)
         return self.best_model.predict(X)
 
+
+def _row_latency(predict, X: Union[pd.DataFrame, np.ndarray], n_rows: int = 100) -> float:
+    """单行预测的中位延迟（毫秒）"""
+    X = X.to_numpy(dtype=np.float32) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=np.float32)
+    samples = []
+    for i in range(min(n_rows, len(X))):
+        row = X[i:i + 1]
+        start = time.perf_counter()
+        predict(row)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000
+
+
+def _oob_mask(model, n_samples: int) -> np.ndarray:
+    """
+    计算自助采样森林各树的袋外样本掩码
+    
+    Args:
+        model: 以 bootstrap=True 训练的 sklearn 森林
+        n_samples: 训练样本数
+        
+    Returns:
+        形状为 (n_samples, n_trees) 的布尔数组，True 表示该样本不在该树的自助样本中
+    """
+    if not getattr(model, 'bootstrap', False):
+        raise ValueError("按袋外预测选树需要以 bootstrap=True 训练的森林")
+    max_samples = model.max_samples
+    if max_samples is None:
+        n_bootstrap = n_samples
+    elif isinstance(max_samples, float):
+        n_bootstrap = max(int(max_samples * n_samples), 1)
+    else:
+        n_bootstrap = max_samples
+    
+    # 与 sklearn 无样本权重时的自助采样相同：每棵树用自己的 random_state 有放回抽取行号
+    mask = np.ones((n_samples, len(model.estimators_)), dtype=bool)
+    for i, tree in enumerate(model.estimators_):
+        sampled = check_random_state(tree.random_state).randint(0, n_samples, n_bootstrap)
+        mask[sampled, i] = False
+    return mask
+
+
+def _fit_worker(task: Tuple) -> Tuple[object, np.ndarray, np.ndarray, Optional[Dict]]:
+    """
+    工作进程入口：以内存映射打开共享数据，在限定的线程数内训练一个模型
+    
+    Args:
+        task: (模型声明字典, 随机种子, 特征列名, (训练集路径, 测试集路径), 目标变量路径,
+               是否自适应, 核心数)
+        
+    Returns:
+        (训练好的模型, 训练集预测, 测试集预测, 自适应报告或None)
+    """
+    from threadpoolctl import threadpool_limits
+    
+    spec_dict, random_state, feature_names, (X_train_path, X_test_path), y_path, adaptive_forest, n_cores = task
+    spec = ModelSpec(**spec_dict)
+    X_train = np.load(X_train_path, mmap_mode='r')
+    X_test = np.load(X_test_path, mmap_mode='r')
+    y_train = np.load(y_path, mmap_mode='r')
+    
+    trainer = ModelTrainer(random_state=random_state, registry=ModelRegistry([spec]))
+    with threadpool_limits(limits=n_cores):
+        return trainer._fit_one(spec, X_train, X_test, y_train, feature_names, adaptive_forest, n_jobs=n_cores)
+
+
+def _cv_worker(task: Tuple) -> Dict[str, float]:
+    """
+    交叉验证工作进程入口：以内存映射切片读取一折的训练/测试区间，训练并评估一个模型
+    
+    Args:
+        task: (模型声明字典, 随机种子, 特征列名, 特征路径, 目标变量路径,
+               折序号, 训练区间, 测试区间, 核心数)
+        
+    Returns:
+        该折的评估指标
+    """
+    from threadpoolctl import threadpool_limits
+    
+    spec_dict, random_state, feature_names, X_path, y_path, fold, train_range, test_range, n_cores = task
+    spec = ModelSpec(**spec_dict)
+    X = np.load(X_path, mmap_mode='r')
+    y = np.load(y_path, mmap_mode='r')
+    X_train, y_train = X[slice(*train_range)], y[slice(*train_range)]
+    X_test, y_test = X[slice(*test_range)], y[slice(*test_range)]
+    
+    trainer = ModelTrainer(random_state=random_state, registry=ModelRegistry([spec]))
+    if spec.scale:
+        artifact = trainer.preprocessor.fit_artifact(X_train, scale=True)
+        X_train, X_test = artifact.transform(X_train), artifact.transform(X_test)
+    
+    limits = None if n_cores < 0 else n_cores
+    start = time.perf_counter()
+    with threadpool_limits(limits=limits):
+        model = spec.build(random_state, feature_names, n_jobs=n_cores)
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+    fit_time = time.perf_counter() - start
+    
+    metrics = trainer._calculate_metrics(y_test, y_pred)
+    return {
+        'fold': fold,
+        'train_size': train_range[1] - train_range[0],
+        'test_size': test_range[1] - test_range[0],
+        **metrics,
+        'fit_time': fit_time
+    }
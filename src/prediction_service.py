@@ -0,0 +1,424 @@
+"""
+预测服务模块
+基于asyncio的本地HTTP预测服务：模型和预处理产物只加载一次，
+并发到达的单行请求被合并为微批次一起预测，并统计延迟分位数和吞吐量。
+多进程模式下模型在fork前加载到内存映射/共享页中，各工作进程共享同一份模型
+"""
+
+import asyncio
+import gc
+import json
+import os
+import signal
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from .compact_forest import CompactForest
+from .data_preprocessor import PreprocessingArtifact
+
+
+class PredictionService:
+    """微批次预测服务类
+    
+    请求进入队列后由单个批处理协程消费：取到第一条请求后继续等待，直到凑满
+    max_batch_size 条或等待超过 max_wait_ms，再把整批输入一次转换、一次预测。
+    预测在独立线程中执行，期间事件循环继续接收新请求并组成下一批。
+    """
+    
+    def __init__(self, model, artifact: PreprocessingArtifact, max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0, stats_window: int = 10_000):
+        """
+        初始化预测服务
+        
+        Args:
+            model: 已训练的模型（需有 predict 方法，也可以是紧凑森林）
+            artifact: 预处理产物
+            max_batch_size: 每个微批次的最大请求数
+            max_wait_ms: 凑批次时的最长等待时间（毫秒）
+            stats_window: 延迟统计保留的最近请求数
+        """
+        self.model = model
+        self.artifact = artifact
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._latencies = deque(maxlen=stats_window)
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._completed_at = deque(maxlen=stats_window)
+        self._n_requests = 0
+    
+    @classmethod
+    def from_files(cls, model_path: str, artifact_path: str, **kwargs) -> "PredictionService":
+        """
+        从模型文件和预处理产物文件创建服务
+        
+        Args:
+            model_path: 模型文件（.forest 为紧凑森林，其余按joblib加载）
+            artifact_path: 预处理产物JSON文件
+            **kwargs: 传给构造函数的其他参数
+        
+        Returns:
+            预测服务
+        """
+        if model_path.endswith(".forest"):
+            model = CompactForest.load(model_path)
+        else:
+            model = joblib.load(model_path)
+        return cls(model, PreprocessingArtifact.load(artifact_path), **kwargs)
+    
+    async def predict(self, row: Mapping[str, float]) -> float:
+        """
+        预测单行（与其他并发请求合并为微批次）
+        
+        Args:
+            row: 特征名到值的字典
+        
+        Returns:
+            预测值
+        
+        Raises:
+            ValueError: 缺少特征列或特征值不是有限数值（在入队前检查，不影响同批次的其他请求）
+        """
+        values = _row_vector(row, self.artifact.feature_columns)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((values, future, time.perf_counter()))
+        return await future
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        延迟分位数、吞吐量和平均批大小（吞吐量按最近 stats_window 个请求的完成时间跨度计算）
+        
+        Returns:
+            统计字典
+        """
+        latencies = np.array(self._latencies) * 1000
+        span = self._completed_at[-1] - self._completed_at[0] if len(self._completed_at) > 1 else 0.0
+        return {
+            'requests': self._n_requests,
+            'throughput_rps': (len(self._completed_at) - 1) / span if span > 0 else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            'mean_batch_size': float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+            'worker_pid': os.getpid(),
+            'memory_mb': process_memory(),
+        }
+    
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000,
+                    sock: Optional[socket.socket] = None) -> None:
+        """
+        启动HTTP服务并一直运行
+        
+        接口:
+            POST /predict  请求体为单行特征对象，或 {"rows": [...]} 多行
+            GET  /stats    延迟与吞吐统计
+            GET  /health   健康检查
+        
+        Args:
+            host: 监听地址
+            port: 监听端口
+            sock: 已绑定的监听套接字（多进程模式下由父进程创建并在fork后共享）
+        """
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch_loop())
+        if sock is not None:
+            server = await asyncio.start_server(self._handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            print(f"预测服务已启动: http://{host}:{port} "
+                  f"(最大批大小 {self.max_batch_size}, 最长等待 {self.max_wait * 1000:.1f} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._executor.shutdown(wait=False)
+    
+    async def _batch_loop(self) -> None:
+        """批处理协程：凑批次后在线程中一次性预测"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._run_batch(loop, batch)
+            except Exception as exc:
+                # 批处理协程必须一直存活，否则之后的所有请求都会永远等待
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+    
+    async def _run_batch(self, loop: asyncio.AbstractEventLoop, batch: List[Tuple]) -> None:
+        """预测一个批次；整批失败时逐行重试，使每行得到各自的结果或错误"""
+        try:
+            values = np.array([item[0] for item in batch], dtype=np.float64)
+            outcomes = list(await loop.run_in_executor(self._executor, self._predict_batch, values))
+        except Exception:
+            outcomes = await loop.run_in_executor(self._executor, self._predict_rows,
+                                                  [item[0] for item in batch])
+        
+        now = time.perf_counter()
+        self._batch_sizes.append(len(batch))
+        for (_, future, enqueued_at), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+                continue
+            self._latencies.append(now - enqueued_at)
+            self._completed_at.append(now)
+            self._n_requests += 1
+            future.set_result(float(outcome))
+    
+    def share_model(self, directory: str) -> None:
+        """
+        为多进程模式准备共享模型（在fork前调用）
+        
+        随机森林/极端随机树导出为紧凑森林文件并以只读内存映射方式重新加载，所有工作进程
+        共享同一份页缓存；其他模型（包括梯度提升等树集成）保持原样，依赖fork的写时复制共享，
+        并冻结GC跟踪的对象，避免子进程中的垃圾回收改写对象头导致页面被复制。
+        
+        Args:
+            directory: 紧凑森林文件的存放目录
+        """
+        if CompactForest.supports(self.model):
+            path = os.path.join(directory, "shared_model.forest")
+            CompactForest.from_estimator(self.model, self.artifact.feature_columns).save(path)
+            self.model = CompactForest.load(path)
+        gc.collect()
+        gc.freeze()
+    
+    def _predict_batch(self, values: np.ndarray) -> np.ndarray:
+        """转换并预测一个批次"""
+        return self.model.predict(self.artifact.transform(values))
+    
+    def _predict_rows(self, rows: List[List[float]]) -> List:
+        """逐行预测，失败的行返回异常对象"""
+        outcomes = []
+        for values in rows:
+            try:
+                outcomes.append(self._predict_batch(np.array([values], dtype=np.float64))[0])
+            except Exception as exc:
+                outcomes.append(exc)
+        return outcomes
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个HTTP/1.1连接（支持keep-alive）"""
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError as exc:
+                    # 请求行或请求头无法解析时无法确定下一个请求的边界，回复400后关闭连接
+                    _write_response(writer, 400, {'error': f"请求格式错误: {exc}"}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._route(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        """按请求路径分发"""
+        if method == "GET" and path == "/health":
+            return 200, {'status': 'ok'}
+        if method == "GET" and path == "/stats":
+            return 200, self.stats()
+        if method == "POST" and path == "/predict":
+            try:
+                data = json.loads(body)
+                if 'rows' in data:
+                    predictions = await asyncio.gather(*(self.predict(row) for row in data['rows']))
+                    return 200, {'predictions': list(predictions)}
+                return 200, {'prediction': await self.predict(data)}
+            except (ValueError, KeyError, TypeError) as exc:
+                return 400, {'error': f"请求格式错误: {exc}"}
+        return 404, {'error': f"未知接口: {method} {path}"}
+
+
+def serve_prefork(service: PredictionService, host: str = "127.0.0.1", port: int = 8000,
+                  workers: Optional[int] = None, report_after: float = 5.0) -> None:
+    """
+    预先fork多个工作进程共同监听同一端口，每个进程运行一个微批次服务
+    
+    父进程创建监听套接字后fork，内核在各工作进程间分配新连接；每个工作进程把
+    BLAS/OpenMP线程限制为1，由进程数占满所有核心。父进程在 report_after 秒后
+    以及退出时打印各工作进程的内存占用（RSS、PSS 和私有内存）。仅支持POSIX系统。
+    
+    Args:
+        service: 已加载模型的预测服务（建议先调用 share_model）
+        host: 监听地址
+        port: 监听端口
+        workers: 工作进程数，默认为CPU核心数
+        report_after: 启动后多少秒打印内存报告
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("多进程模式需要支持fork的系统")
+    
+    workers = workers or os.cpu_count() or 1
+    sock = socket.create_server((host, port), backlog=1024)
+    
+    pids: List[int] = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(service, sock)
+        pids.append(pid)
+    
+    print(f"预测服务已启动: http://{host}:{port} ({workers} 个工作进程, "
+          f"最大批大小 {service.max_batch_size}, 最长等待 {service.max_wait * 1000:.1f} ms)")
+    try:
+        time.sleep(report_after)
+        _print_worker_memory(pids)
+        for pid in pids:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        _print_worker_memory(pids)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            os.waitpid(pid, 0)
+        print("\n预测服务已停止")
+    finally:
+        sock.close()
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    读取进程内存占用（MB），来自 /proc/<pid>/smaps_rollup，非Linux系统返回空字典
+    
+    rss 为常驻内存，pss 为按共享进程数均摊后的内存，private 为该进程独占的内存
+    （即每增加一个工作进程带来的额外开销）。
+    
+    Args:
+        pid: 进程号，默认为当前进程
+        
+    Returns:
+        内存统计字典
+    """
+    path = f"/proc/{pid or 'self'}/smaps_rollup"
+    try:
+        with open(path, "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+    except OSError:
+        return {}
+    
+    def kb(name: str) -> float:
+        return int(fields.get(name, "0 kB").split()[0])
+    
+    return {
+        'rss': round(kb('Rss') / 1024, 1),
+        'pss': round(kb('Pss') / 1024, 1),
+        'private': round((kb('Private_Clean') + kb('Private_Dirty')) / 1024, 1),
+    }
+
+
+def _run_worker(service: PredictionService, sock: socket.socket) -> None:
+    """工作进程入口：单线程推理，运行服务直到收到SIGTERM"""
+    from threadpoolctl import threadpool_limits
+    
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+    try:
+        with threadpool_limits(limits=1):
+            asyncio.run(service.serve(sock=sock))
+    finally:
+        os._exit(0)
+
+
+def _print_worker_memory(pids: List[int]) -> None:
+    """打印各工作进程的内存占用"""
+    print("\n工作进程内存 (MB):")
+    for pid in pids:
+        memory = process_memory(pid)
+        if memory:
+            print(f"  pid {pid}: RSS {memory['rss']:.1f}, PSS {memory['pss']:.1f}, 私有 {memory['private']:.1f}")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """读取一个HTTP请求，连接关闭时返回None，请求行或请求头格式错误时抛出ValueError"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ValueError(f"无法解析的请求行: {request_line[:100]!r}")
+    method, path, _ = parts
+    
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator or not name.strip():
+            raise ValueError(f"无法解析的请求头: {line[:100]!r}")
+        headers[name.strip().lower()] = value.strip()
+    
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ValueError(f"Content-Length 不是整数: {headers['content-length']!r}") from None
+    if length < 0:
+        raise ValueError(f"Content-Length 不能为负数: {length}")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _row_vector(row: Mapping[str, float], feature_columns: List[str]) -> List[float]:
+    """按特征列顺序把一行请求转换为浮点数列表，缺列或值不是有限数值时抛出ValueError"""
+    if not isinstance(row, Mapping):
+        raise ValueError(f"每行应为特征名到值的对象，收到 {type(row).__name__}")
+    missing = [col for col in feature_columns if col not in row]
+    if missing:
+        raise ValueError(f"缺少特征列: {missing}")
+    values = []
+    for col in feature_columns:
+        value = row[col]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"特征 {col} 的值应为数值，收到 {value!r}")
+        if not np.isfinite(value):
+            raise ValueError(f"特征 {col} 的值不是有限数值: {value!r}")
+        values.append(float(value))
+    return values
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool) -> None:
+    """写入JSON响应"""
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found"}
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
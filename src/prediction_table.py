@@ -0,0 +1,304 @@
+"""
+预测查找表模块
+在所有日历特征组合 × 量化天气网格上预先计算模型预测，
+推理时按日历组合O(1)定位、在天气网格上多线性插值，无需调用模型
+"""
+
+import itertools
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+CALENDAR_COLUMNS = ['season', 'yr', 'mnth', 'hr', 'holiday', 'weekday', 'workingday', 'weathersit']
+WEATHER_COLUMNS = ['temp', 'atemp', 'hum', 'windspeed']
+DEFAULT_LEVELS = (5, 5, 4, 3)
+
+
+class PredictionLookupTable:
+    """预测查找表类
+    
+    日历组合由参考数据中出现过的 (season, mnth) 和 (holiday, weekday, workingday)
+    组合与 yr、hr、weathersit 的所有取值做笛卡尔积得到，即所有合法的日历组合，
+    而不只是参考数据中出现过的行。日历特征按混合进制编码为整数，经 slots 数组
+    O(1) 映射到表中的行；天气特征在各自取值范围内等距量化，查询时对16个网格角点
+    做多线性插值。
+    
+    目录结构:
+        table.npy  float32 预测值 (n_calendar, *levels)
+        slots.npy  int32 日历编码到表行号的映射，未覆盖的组合为-1
+        meta.json  特征列、编码进制、天气网格
+    """
+    
+    TABLE_FILE = "table.npy"
+    SLOTS_FILE = "slots.npy"
+    META_FILE = "meta.json"
+    
+    def __init__(self, table: np.ndarray, slots: np.ndarray, feature_columns: Sequence[str],
+                 radices: Sequence[int], axes: Sequence[np.ndarray]):
+        """
+        初始化查找表
+        
+        Args:
+            table: 预测值数组 (n_calendar, *levels)
+            slots: 日历编码到表行号的映射
+            feature_columns: 模型输入的特征列顺序
+            radices: 各日历特征的编码进制（最大取值+1）
+            axes: 各天气特征的网格坐标
+        """
+        self.table = table
+        self.slots = slots
+        self.feature_columns = list(feature_columns)
+        self.radices = np.asarray(radices, dtype=np.int64)
+        self.axes = [np.asarray(axis, dtype=np.float32) for axis in axes]
+        self.fallback: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        
+        self._calendar_idx = [self.feature_columns.index(col) for col in CALENDAR_COLUMNS]
+        self._weather_idx = [self.feature_columns.index(col) for col in WEATHER_COLUMNS]
+        self._multipliers = np.concatenate([np.cumprod(self.radices[::-1])[::-1][1:], [1]])
+        self._flat = self.table.reshape(len(self.table), -1)
+        self._strides = np.array([int(np.prod(self.table.shape[2 + d:])) for d in range(len(self.axes))])
+    
+    @property
+    def nbytes(self) -> int:
+        """表和映射数组占用的总字节数"""
+        return self.table.nbytes + self.slots.nbytes
+    
+    @classmethod
+    def build(cls, predict: Callable[[np.ndarray], np.ndarray], X_reference: Union[pd.DataFrame, np.ndarray],
+              feature_columns: Sequence[str], levels: Sequence[int] = DEFAULT_LEVELS,
+              batch_rows: int = 500_000) -> "PredictionLookupTable":
+        """
+        在所有日历组合 × 天气网格上调用模型预测并构建查找表
+        
+        Args:
+            predict: 预测函数，输入为按 feature_columns 排列的float32矩阵
+            X_reference: 参考数据（通常为训练集），用于确定合法日历组合和天气取值范围
+            feature_columns: 特征列名
+            levels: 各天气特征（temp, atemp, hum, windspeed）的网格点数
+            batch_rows: 每次调用预测函数的最大行数
+        
+        Returns:
+            查找表
+        
+        Raises:
+            ValueError: 特征不是恰好的日历和天气特征、网格点数不足，或某个天气特征在参考数据中为常数
+        """
+        feature_columns = list(feature_columns)
+        extra = set(feature_columns) - set(CALENDAR_COLUMNS) - set(WEATHER_COLUMNS)
+        if extra or len(feature_columns) != len(CALENDAR_COLUMNS) + len(WEATHER_COLUMNS):
+            raise ValueError(f"查找表只支持日历和天气特征，多余或缺失的特征: {sorted(extra)}")
+        if len(levels) != len(WEATHER_COLUMNS) or min(levels) < 2:
+            raise ValueError("每个天气特征至少需要2个网格点")
+        
+        reference = X_reference if isinstance(X_reference, pd.DataFrame) else \
+            pd.DataFrame(np.asarray(X_reference), columns=feature_columns)
+        calendar = _calendar_combinations(reference)
+        axes = [np.linspace(reference[col].min(), reference[col].max(), n, dtype=np.float32)
+                for col, n in zip(WEATHER_COLUMNS, levels)]
+        constant = [col for col, axis in zip(WEATHER_COLUMNS, axes) if not (np.diff(axis) > 0).all()]
+        if constant:
+            # 零宽度的网格轴会使插值位置除以零
+            raise ValueError(f"参考数据中这些天气特征没有取值范围（为常数或NaN），无法构建网格: {constant}")
+        grid = np.array(list(itertools.product(*axes)), dtype=np.float32)
+        
+        n_calendar, n_grid = len(calendar), len(grid)
+        print(f"构建查找表: {n_calendar} 个日历组合 x {n_grid} 个天气网格点 = {n_calendar * n_grid} 次预测")
+        
+        calendar_pos = [feature_columns.index(col) for col in CALENDAR_COLUMNS]
+        weather_pos = [feature_columns.index(col) for col in WEATHER_COLUMNS]
+        table = np.empty((n_calendar, n_grid), dtype=np.float32)
+        chunk = max(1, batch_rows // n_grid)
+        start_time = time.perf_counter()
+        for start in range(0, n_calendar, chunk):
+            block = calendar[start:start + chunk]
+            X = np.empty((len(block) * n_grid, len(feature_columns)), dtype=np.float32)
+            X[:, calendar_pos] = np.repeat(block, n_grid, axis=0)
+            X[:, weather_pos] = np.tile(grid, (len(block), 1))
+            table[start:start + len(block)] = predict(X).reshape(len(block), n_grid)
+        print(f"查找表构建完成, 耗时 {time.perf_counter() - start_time:.1f} s, "
+              f"大小 {table.nbytes / 1024 ** 2:.1f} MB")
+        
+        radices = calendar.max(axis=0).astype(np.int64) + 1
+        multipliers = np.concatenate([np.cumprod(radices[::-1])[::-1][1:], [1]])
+        slots = np.full(int(np.prod(radices)), -1, dtype=np.int32)
+        slots[calendar.astype(np.int64) @ multipliers] = np.arange(n_calendar, dtype=np.int32)
+        
+        return cls(table.reshape(n_calendar, *levels), slots, feature_columns, radices, axes)
+    
+    def predict(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        查表预测（天气特征多线性插值，超出网格范围的值截断到边界）
+        
+        未覆盖的日历组合使用 fallback 预测函数（若已设置），否则为NaN。
+        
+        Args:
+            X: 特征数据（列顺序与 feature_columns 一致）
+        
+        Returns:
+            预测值数组
+        """
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_columns].to_numpy(dtype=np.float32)
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        
+        codes = X[:, self._calendar_idx].astype(np.int64)
+        in_range = np.all((codes >= 0) & (codes < self.radices), axis=1)
+        rows = np.full(len(X), -1, dtype=np.int64)
+        rows[in_range] = self.slots[codes[in_range] @ self._multipliers]
+        hit = rows >= 0
+        
+        # 各天气维度的下侧网格索引和插值权重
+        lower, frac = [], []
+        for d, axis in enumerate(self.axes):
+            position = (X[:, self._weather_idx[d]] - axis[0]) / (axis[1] - axis[0])
+            position = np.clip(position, 0, len(axis) - 1)
+            index = np.minimum(position.astype(np.int64), len(axis) - 2)
+            lower.append(index)
+            frac.append(position - index)
+        
+        base = sum(index * stride for index, stride in zip(lower, self._strides))
+        safe_rows = np.where(hit, rows, 0)
+        predictions = np.zeros(len(X), dtype=np.float64)
+        for corner in itertools.product((0, 1), repeat=len(self.axes)):
+            weight = np.ones(len(X), dtype=np.float64)
+            offset = 0
+            for d, bit in enumerate(corner):
+                weight *= frac[d] if bit else 1 - frac[d]
+                offset += bit * self._strides[d]
+            predictions += weight * self._flat[safe_rows, base + offset]
+        
+        if not hit.all():
+            if self.fallback is not None:
+                predictions[~hit] = self.fallback(X[~hit])
+            else:
+                predictions[~hit] = np.nan
+        return predictions
+    
+    def evaluate(self, predict: Callable[[np.ndarray], np.ndarray],
+                 X: Union[pd.DataFrame, np.ndarray], n_single: int = 200) -> Dict[str, float]:
+        """
+        与模型预测对比误差和延迟
+        
+        Args:
+            predict: 模型预测函数（与构建时相同）
+            X: 评估数据（通常为测试集）
+            n_single: 单行延迟测量的次数
+        
+        Returns:
+            误差界（最大/P99绝对误差、RMSE、覆盖率）和延迟对比
+        """
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_columns].to_numpy(dtype=np.float32)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        
+        model_time, model_pred = _timed(predict, X)
+        table_time, table_pred = _timed(self.predict, X)
+        covered = ~np.isnan(table_pred)
+        error = np.abs(table_pred[covered] - model_pred[covered])
+        
+        report = {
+            'coverage': float(covered.mean()),
+            'max_abs_error': float(error.max()) if len(error) else float('nan'),
+            'p99_abs_error': float(np.percentile(error, 99)) if len(error) else float('nan'),
+            'rmse_vs_model': float(np.sqrt(np.mean(error ** 2))) if len(error) else float('nan'),
+            'model_single_ms': _single_row_ms(predict, X, n_single),
+            'table_single_ms': _single_row_ms(self.predict, X, n_single),
+            'model_batch_s': model_time,
+            'table_batch_s': table_time,
+        }
+        
+        print(f"\n查找表误差 (相对模型预测, 覆盖率 {report['coverage']:.1%}):")
+        print(f"  最大绝对误差: {report['max_abs_error']:.2f}, P99: {report['p99_abs_error']:.2f}, "
+              f"RMSE: {report['rmse_vs_model']:.2f}")
+        print(f"延迟对比 ({len(X)} 行):")
+        print(f"  单行: 模型 {report['model_single_ms']:.3f} ms, 查找表 {report['table_single_ms']:.3f} ms")
+        print(f"  批量: 模型 {model_time * 1000:.1f} ms, 查找表 {table_time * 1000:.1f} ms")
+        return report
+    
+    def save(self, directory: str) -> None:
+        """
+        保存查找表
+        
+        Args:
+            directory: 保存目录
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, self.META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        
+        np.save(os.path.join(directory, self.TABLE_FILE), self.table)
+        np.save(os.path.join(directory, self.SLOTS_FILE), self.slots)
+        meta = {
+            'feature_columns': self.feature_columns,
+            'radices': self.radices.tolist(),
+            'axes': [axis.astype(np.float64).tolist() for axis in self.axes],
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        print(f"查找表已保存至: {directory} ({self.nbytes / 1024 ** 2:.1f} MB)")
+    
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "PredictionLookupTable":
+        """
+        加载查找表
+        
+        Args:
+            directory: 保存目录
+            mmap: 是否以只读内存映射方式打开
+        
+        Returns:
+            查找表
+        """
+        with open(os.path.join(directory, cls.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        table = np.load(os.path.join(directory, cls.TABLE_FILE), mmap_mode=mmap_mode)
+        slots = np.load(os.path.join(directory, cls.SLOTS_FILE), mmap_mode=mmap_mode)
+        return cls(table, slots, meta['feature_columns'], meta['radices'], meta['axes'])
+
+
+def _calendar_combinations(reference: pd.DataFrame) -> np.ndarray:
+    """
+    合法日历组合：观测到的 (season, mnth) 与 (holiday, weekday, workingday) 组合，
+    与 yr、hr、weathersit 的所有观测取值做笛卡尔积
+    
+    Returns:
+        按 CALENDAR_COLUMNS 排列的整数数组 (n_combinations, 8)
+    """
+    season_month = reference[['season', 'mnth']].drop_duplicates().to_numpy()
+    day_type = reference[['holiday', 'weekday', 'workingday']].drop_duplicates().to_numpy()
+    years = np.unique(reference['yr'])
+    hours = np.unique(reference['hr'])
+    weather = np.unique(reference['weathersit'])
+    
+    rows: List[Tuple] = []
+    for (season, month), year, hour, (holiday, weekday, workingday), situation in itertools.product(
+            season_month, years, hours, day_type, weather):
+        rows.append((season, year, month, hour, holiday, weekday, workingday, situation))
+    return np.array(rows, dtype=np.int64)
+
+
+def _timed(func: Callable, X: np.ndarray) -> Tuple[float, np.ndarray]:
+    """执行一次并返回 (耗时秒数, 结果)"""
+    start = time.perf_counter()
+    result = func(X)
+    return time.perf_counter() - start, np.asarray(result, dtype=np.float64)
+
+
+def _single_row_ms(func: Callable, X: np.ndarray, n_single: int) -> float:
+    """单行预测的中位延迟（毫秒）"""
+    samples = []
+    for i in range(min(n_single, len(X))):
+        row = X[i:i + 1]
+        start = time.perf_counter()
+        func(row)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000
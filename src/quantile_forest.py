@@ -0,0 +1,140 @@
+"""
+分位数森林模块
+复用已训练随机森林的树结构，按训练样本落入的叶子统计各叶子的目标变量分位数，
+预测时对每行样本的叶子编号做一次向量化gather，输出 P10/P90 等预测区间，无需重新训练
+"""
+
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .compact_forest import CompactForest
+
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+
+class QuantileForest:
+    """分位数森林类
+    
+    每个叶子保存训练集中落入该叶子的全部样本（不是自助采样的袋内样本）目标变量的分位数。
+    预测时取样本在各树中的叶子分位数的平均值作为该分位数的估计，这是对
+    Meinshausen 分位数回归森林（各树叶子样本混合分布的分位数）的近似，
+    代价与一次森林预测相同：一次逐层遍历加每个分位数一次gather。
+    """
+    
+    def __init__(self, forest: CompactForest, leaf_quantiles: np.ndarray, quantiles: Sequence[float]):
+        """
+        初始化分位数森林
+        
+        Args:
+            forest: 紧凑森林
+            leaf_quantiles: 各节点的目标分位数 (n_quantiles, n_nodes)，非叶子节点为NaN
+            quantiles: 分位数水平
+        """
+        self.forest = forest
+        self.leaf_quantiles = leaf_quantiles
+        self.quantiles = list(quantiles)
+    
+    @classmethod
+    def fit(cls, forest: CompactForest, X_train: Union[pd.DataFrame, np.ndarray],
+            y_train: Union[pd.Series, np.ndarray],
+            quantiles: Sequence[float] = DEFAULT_QUANTILES) -> "QuantileForest":
+        """
+        用训练数据的叶子分配统计各叶子的分位数（不改变树结构）
+        
+        所有 (叶子, 目标值) 对按叶子、目标值一次排序，各叶子的样本成为排序后数组中的
+        连续区间，分位数由区间起点和长度直接算出线性插值位置，没有逐叶子的Python循环。
+        
+        Args:
+            forest: 由已训练森林导出的紧凑森林
+            X_train: 训练集特征
+            y_train: 训练集目标变量
+            quantiles: 分位数水平
+        
+        Returns:
+            分位数森林
+        """
+        y = np.asarray(y_train, dtype=np.float64)
+        leaves = forest.apply(X_train).ravel()
+        targets = np.repeat(y, forest.n_trees)
+        
+        order = np.lexsort((targets, leaves))
+        sorted_targets = targets[order]
+        counts = np.bincount(leaves, minlength=forest.n_nodes)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        
+        occupied = counts > 0
+        leaf_quantiles = np.full((len(quantiles), forest.n_nodes), np.nan, dtype=np.float32)
+        for i, q in enumerate(quantiles):
+            position = starts[occupied] + q * (counts[occupied] - 1)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, starts[occupied] + counts[occupied] - 1)
+            weight = position - lower
+            leaf_quantiles[i, occupied] = (1 - weight) * sorted_targets[lower] + weight * sorted_targets[upper]
+        
+        # 没有样本落入的叶子（传入的不是训练该森林的数据时可能出现）退回叶子均值
+        empty = np.isnan(leaf_quantiles)
+        if empty.any():
+            leaf_quantiles[empty] = np.broadcast_to(forest.value, leaf_quantiles.shape)[empty]
+        
+        return cls(forest, leaf_quantiles, quantiles)
+    
+    def predict(self, X: Union[pd.DataFrame, np.ndarray], block_size: Optional[int] = None) -> pd.DataFrame:
+        """
+        预测各分位数和均值
+        
+        Args:
+            X: 特征数据（列顺序与训练时一致）
+            block_size: 每批样本数，默认与紧凑森林相同
+        
+        Returns:
+            DataFrame，列为 mean 以及 p10/p50/p90 等分位数
+        """
+        forest = self.forest
+        index = X.index if isinstance(X, pd.DataFrame) else None
+        X = forest._as_float32(X)
+        n_samples = len(X)
+        if block_size is None:
+            block_size = max(1, (1 << 18) // forest.n_trees)
+        
+        mean = np.empty(n_samples, dtype=np.float64)
+        bounds = np.empty((len(self.quantiles), n_samples), dtype=np.float64)
+        for start in range(0, n_samples, block_size):
+            block = X[start:start + block_size]
+            nodes = forest._traverse(block)
+            rows = slice(start, start + len(block))
+            mean[rows] = forest.value[nodes].mean(axis=0, dtype=np.float64)
+            bounds[:, rows] = self.leaf_quantiles[:, nodes].mean(axis=1, dtype=np.float64)
+        
+        result = {'mean': mean}
+        for q, values in zip(self.quantiles, bounds):
+            result[_quantile_name(q)] = values
+        return pd.DataFrame(result, index=index)
+    
+    def coverage(self, X: Union[pd.DataFrame, np.ndarray], y: Union[pd.Series, np.ndarray],
+                 lower: float = 0.1, upper: float = 0.9) -> float:
+        """
+        计算真实值落在 [lower, upper] 分位数区间内的比例（用于检验区间校准）
+        
+        Args:
+            X: 特征数据
+            y: 真实值
+            lower: 下分位数水平
+            upper: 上分位数水平
+        
+        Returns:
+            覆盖率
+        """
+        if lower not in self.quantiles or upper not in self.quantiles:
+            raise ValueError(f"分位数 {lower}/{upper} 不在已拟合的分位数 {self.quantiles} 中")
+        predictions = self.predict(X)
+        y = np.asarray(y, dtype=np.float64)
+        inside = (y >= predictions[_quantile_name(lower)]) & (y <= predictions[_quantile_name(upper)])
+        return float(np.mean(inside))
+
+
+def _quantile_name(q: float) -> str:
+    """分位数列名，如 0.1 -> p10"""
+    return f"p{q * 100:g}"
@@ -99,9 +99,9 @@ class Visualizer:
         plt.close()  # 确保关闭图形，释放资源
 
     def plot_feature_importance(self, importance_df: pd.DataFrame,
-                                top_n: int = 10, save_path: str = None) -> None:
+                                top_n: int = 10, save_path: str = None, source: str = None) -> None:
         """
-        绘制特征重要性图
+        绘制特征重要性图（source 为重要性来源的模型名称，显示在标题中）
         """
         top_features = importance_df.head(top_n)
 
@@ -109,7 +109,10 @@ class Visualizer:
         sns.barplot(data=top_features, x='importance', y='feature', hue='feature', palette='viridis', legend=False)
         plt.xlabel('重要性', fontsize=12)
         plt.ylabel('特征', fontsize=12)
-        plt.title(f'特征重要性 (Top {top_n})', fontsize=14, fontweight='bold')
+        title = f'特征重要性 (Top {top_n})'
+        if source:
+            title += f' - {source}'
+        plt.title(title, fontsize=14, fontweight='bold')
         plt.grid(True, alpha=0.3, axis='x')
 
         if save_path is None:
@@ -0,0 +1,34 @@
+"""
+模型训练器测试
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.model_registry import ModelRegistry, ModelSpec
+from src.model_trainer import ModelTrainer
+
+
+def test_adaptive_forest_keeps_spec_params():
+    """自适应树数量训练保留注册表中的全部森林参数"""
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 4))
+    y = X @ np.array([1.0, 2.0, 3.0, 4.0]) + rng.normal(0, 0.1, 300)
+    
+    spec = ModelSpec('Random Forest', 'random_forest',
+                     params={'n_estimators': 40, 'max_depth': 5, 'min_samples_leaf': 7,
+                             'max_features': 0.5, 'n_jobs': 1},
+                     adaptive=True)
+    trainer = ModelTrainer(registry=ModelRegistry([spec]))
+    trainer.train_models(X, y, adaptive_forest=True)
+    
+    model = trainer.models['Random Forest']
+    assert model.min_samples_leaf == 7
+    assert model.max_features == 0.5
+    assert model.max_depth == 5
+    assert model.n_estimators <= 40
+    assert all(tree.min_samples_leaf == 7 for tree in model.estimators_)